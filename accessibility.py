@@ -0,0 +1,153 @@
+"""Distancia a la oficina más cercana y cobertura territorial de la red FNA.
+
+Las oficinas se indexan una sola vez en un KD-tree sobre vectores unitarios de la
+esfera: la distancia de cuerda es monótona con la de gran círculo, así que el
+vecino más cercano coincide con el de la fórmula de haversine.
+
+Uso:
+    python accessibility.py build               Calcular la rejilla de cobertura en data/build/cobertura.arrow
+    python accessibility.py consultar LAT LON   Distancia a la oficina más cercana de un punto
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import shapely
+from scipy.spatial import cKDTree
+
+from pipeline import BUILD_DIR, CSV_PATH, _read_table, _write_table, latest_snapshot, source_hash, source_paths
+
+COVERAGE_PATH = os.path.join(BUILD_DIR, "cobertura.arrow")
+
+RADIO_TIERRA_KM = 6371.0088
+
+# Paso de la rejilla en grados (~5,5 km en el ecuador)
+PASO_COBERTURA = 0.05
+
+def _unit_vectors(latitudes, longitudes):
+    """Coordenadas geográficas como vectores unitarios en R3"""
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.radians(np.asarray(longitudes, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+def build_office_index(latitudes, longitudes):
+    """Índice espacial de las oficinas para consultas de vecino más cercano"""
+    return cKDTree(_unit_vectors(latitudes, longitudes))
+
+def nearest_office(indice, latitudes, longitudes):
+    """Distancia de gran círculo (km) y posición de la oficina más cercana a cada punto"""
+    cuerda, posicion = indice.query(_unit_vectors(np.atleast_1d(latitudes), np.atleast_1d(longitudes)))
+    distancia = 2 * RADIO_TIERRA_KM * np.arcsin(np.clip(cuerda / 2, 0, 1))
+    return distancia, posicion
+
+def coverage_grid(data_unida, paso=PASO_COBERTURA):
+    """Centros de una rejilla regular dentro de los departamentos, con su código"""
+    departamentos = data_unida.to_crs(4326)
+    minx, miny, maxx, maxy = departamentos.total_bounds
+    lon, lat = np.meshgrid(np.arange(minx + paso / 2, maxx, paso), np.arange(miny + paso / 2, maxy, paso))
+    puntos = shapely.points(lon.ravel(), lat.ravel())
+
+    idx_departamentos, idx_puntos = shapely.STRtree(puntos).query(departamentos.geometry.values, predicate='intersects')
+    _, primeros = np.unique(idx_puntos, return_index=True)
+    idx_puntos, idx_departamentos = idx_puntos[primeros], idx_departamentos[primeros]
+
+    return pd.DataFrame({
+        'latitud': lat.ravel()[idx_puntos],
+        'longitud': lon.ravel()[idx_puntos],
+        'DPTO_CCDGO': departamentos['DPTO_CCDGO'].to_numpy()[idx_departamentos],
+    })
+
+def build_coverage(data_unida, df, paso=PASO_COBERTURA):
+    """Rejilla de cobertura con la distancia de cada celda a la oficina más cercana"""
+    ubicadas = df[~df['fuera_de_poligonos']]
+    indice = build_office_index(ubicadas['latitud_corregida'], ubicadas['longitud_corregida'])
+
+    cobertura = coverage_grid(data_unida, paso)
+    distancia, _ = nearest_office(indice, cobertura['latitud'], cobertura['longitud'])
+    cobertura['distancia_km'] = distancia
+    return cobertura
+
+def coverage_summary(cobertura):
+    """Distancia a la oficina más cercana por departamento, ponderada por el área de cada celda"""
+    # El área de una celda de la rejilla geográfica es proporcional al coseno de la latitud
+    peso = np.cos(np.radians(cobertura['latitud'].to_numpy()))
+    distancia = cobertura['distancia_km'].to_numpy()
+    grupos = cobertura.assign(_peso=peso, _ponderada=peso * distancia, _lejos=peso * (distancia > 50))
+    resumen = grupos.groupby('DPTO_CCDGO').agg(
+        _peso=('_peso', 'sum'),
+        _ponderada=('_ponderada', 'sum'),
+        _lejos=('_lejos', 'sum'),
+        distancia_maxima_km=('distancia_km', 'max'),
+    )
+    resumen['distancia_media_km'] = resumen['_ponderada'] / resumen['_peso']
+    resumen['area_a_mas_de_50_km'] = resumen['_lejos'] / resumen['_peso']
+    return resumen[['distancia_media_km', 'distancia_maxima_km', 'area_a_mas_de_50_km']]
+
+def load_or_build_coverage(data_unida, df, path=COVERAGE_PATH, paso=PASO_COBERTURA, fuente_sha256=None):
+    """Leer la rejilla de cobertura del disco o calcularla y guardarla si no corresponde a los datos"""
+    fuente_sha256 = fuente_sha256 or source_hash(source_paths(csv_path=latest_snapshot() or CSV_PATH))
+    metadata = {'fuente_sha256': fuente_sha256, 'paso_grados': repr(paso)}
+
+    if os.path.exists(path):
+        tabla = _read_table(path)
+        guardado = {k.decode(): v.decode() for k, v in (tabla.schema.metadata or {}).items()}
+        if all(guardado.get(k) == v for k, v in metadata.items()):
+            return tabla.to_pandas()
+
+    cobertura = build_coverage(data_unida, df, paso)
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        _write_table(pa.Table.from_pandas(cobertura, preserve_index=False), path, metadata)
+    except OSError:
+        # Sistema de archivos de solo lectura: se usa la rejilla calculada en memoria
+        pass
+    return cobertura
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cobertura territorial de la red de oficinas FNA")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    build = subparsers.add_parser('build', help="Calcular la rejilla de cobertura")
+    build.add_argument('--salida', default=COVERAGE_PATH)
+    build.add_argument('--paso', type=float, default=PASO_COBERTURA)
+
+    consultar = subparsers.add_parser('consultar', help="Oficina más cercana a un punto")
+    consultar.add_argument('latitud', type=float)
+    consultar.add_argument('longitud', type=float)
+
+    args = parser.parse_args(argv)
+
+    from pipeline import load_or_build_artifact
+    data_unida, df = load_or_build_artifact()
+
+    if args.comando == 'build':
+        inicio = time.perf_counter()
+        cobertura = load_or_build_coverage(data_unida, df, args.salida, args.paso)
+        print(json.dumps({
+            'cobertura': args.salida,
+            'celdas': len(cobertura),
+            'segundos': round(time.perf_counter() - inicio, 3)
+        }))
+
+    elif args.comando == 'consultar':
+        ubicadas = df[~df['fuera_de_poligonos']]
+        indice = build_office_index(ubicadas['latitud_corregida'], ubicadas['longitud_corregida'])
+        distancia, posicion = nearest_office(indice, args.latitud, args.longitud)
+        oficina = ubicadas.iloc[int(posicion[0])]
+        print(json.dumps({
+            'distancia_km': round(float(distancia[0]), 2),
+            'oficina': oficina.get('direccion', None),
+            'departamento': oficina['DPTO_CCDGO'],
+            'latitud': float(oficina['latitud_corregida']),
+            'longitud': float(oficina['longitud_corregida']),
+        }, ensure_ascii=False))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
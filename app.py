@@ -1,14 +1,17 @@
+import os
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 warnings.filterwarnings("ignore")
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import numpy as np
 import pandas as pd
-import geopandas as gpd
-import folium
-from streamlit_folium import st_folium
-import plotly.express as px
-import plotly.graph_objects as go
-from shapely.geometry import Point
+
+import metrics
+
+# pipeline, tiles y visuals cargan GeoPandas, Folium y Plotly: se importan al usarse,
+# cuando se elige la sección de análisis visual
 
 # Configuración de la página
 st.set_page_config(
@@ -51,223 +54,322 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_and_process_data():
+# Los datos se comparten entre sesiones como un solo objeto (sin copia por acierto de caché):
+# el código que los recibe filtra con máscaras y nunca los modifica.
+# artifact_version cambia al recompilar o actualizar el artefacto y desaloja la versión anterior.
+@st.cache_resource(max_entries=1)
+def load_and_process_data(artifact_version=()):
     """Cargar y procesar los datos una vez al inicio"""
+    from pipeline import CSV_PATH, SHAPEFILE_PATH, latest_snapshot, load_or_build_artifact
+    
     try:
-        
-        shapefile_path = "data/MGN2021_DPTO_POLITICO/MGN_DPTO_POLITICO.shp"
-        data = gpd.read_file(shapefile_path, encoding='utf-8')
-        
-        # Cargar datos de oficinas
-        df = pd.read_csv("data/Oficinas_Fondo_Nacional_del_Ahorro_20250906.csv")
-        
-        # Procesamiento de datos
-        df["departamentos"] = df["departamentos"].str.upper()
-        df["departamentos"].replace(to_replace="HONDA", value="TOLIMA", inplace=True)
-        
-        # Crear DataFrame para unión espacial
-        conteo_oficinas = df['departamentos'].value_counts().reset_index()
-        conteo_oficinas.columns = ['departamento', 'cantidad_oficinas']
-        
-        # Estandarización de caracteres en shapefile
-        caracteres_mal = ['Á', 'É', 'Í', 'Ó', 'Ú']  
-        caracteres_bien = ['A', 'E', 'I', 'O', 'U'] 
-
-        data["DPTO_CNMBR_NORM"] = data["DPTO_CNMBR"].copy()
-        for j in range(len(caracteres_mal)):  
-            data["DPTO_CNMBR_NORM"] = data["DPTO_CNMBR_NORM"].str.replace(caracteres_mal[j], caracteres_bien[j])
-        
-        # Corrección de nombres en el dataset
-        mapeo_nombres = {
-            'BOGOTA  D.C.': 'BOGOTA, D.C.',
-            'BOGOTA D.C.': 'BOGOTA, D.C.',
-            'GUAJIRA': 'LA GUAJIRA',
-            'SAN ANDRES': 'ARCHIPIELAGO DE SAN ANDRES, PROVIDENCIA Y SANTA CATALINA',
-            'NORTE DE SANTADER': 'NORTE DE SANTANDER', 
-            'GUANIA': 'GUAINIA',
-            'VALLE': 'VALLE DEL CAUCA'
-        }
-        
-        conteo_oficinas['departamento_norm'] = conteo_oficinas['departamento'].replace(mapeo_nombres)
-        
-        # Unir datos
-        data_unida = data.merge(conteo_oficinas, 
-                               left_on='DPTO_CNMBR_NORM', 
-                               right_on='departamento_norm', 
-                               how='left')
-        
-        data_unida['cantidad_oficinas'] = data_unida['cantidad_oficinas'].fillna(0)
-        
-        return data_unida, df
+        # Artefacto en disco compartido entre workers y reinicios; se recompila si cambian las fuentes
+        return load_or_build_artifact(SHAPEFILE_PATH, latest_snapshot() or CSV_PATH)
         
     except Exception as e:
         st.error(f"Error cargando datos: {e}")
         # Retornar datos de ejemplo si hay error
         return create_sample_data(), pd.DataFrame()
 
-def create_sample_data():
-    """Crear datos de ejemplo si hay error con los archivos"""
-    sample_data = {
-        'DPTO_CNMBR': ['BOGOTA, D.C.', 'ANTIOQUIA', 'VALLE DEL CAUCA', 'CUNDINAMARCA', 
-                      'SANTANDER', 'NARIÑO', 'TOLIMA', 'ATLANTICO', 'BOLIVAR', 'BOYACA'],
-        'cantidad_oficinas': [20, 4, 4, 4, 3, 3, 3, 2, 2, 2],
-        'geometry': [None] * 10
-    }
-    return pd.DataFrame(sample_data)
+# Combinaciones de filtros de oficinas con conteos y grupos de puntos en caché
+MAX_FILTROS_CACHE = 8
 
-def create_folium_map(all_data, filtered_data, map_type):
-    """Crear mapa Folium con sistema de dos capas"""
-    mapa = folium.Map(location=[4.5709, -74.2973], zoom_start=5)
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_office_index(artifact_version=()):
+    """Bitmaps de los atributos de las oficinas, construidos una vez por artefacto"""
+    from office_index import build_office_index
     
-    # PRIMERA CAPA: Todos los departamentos en gris claro
-    def base_style_function(feature):
-        return {
-            'fillColor': '#F7F7F7FF',
-            'color': 'black',  
-            'weight': 1.1,
-            'fillOpacity': 0.6
-        }
+    data_unida, df = load_and_process_data(artifact_version)
+    if df.empty or 'DPTO_CCDGO' not in df.columns:
+        return None
+    return build_office_index(df, data_unida)
+
+@st.cache_resource(max_entries=MAX_FILTROS_CACHE, show_spinner=False)
+def filtered_office_data(artifact_version=(), office_filter=()):
+    """Departamentos con los conteos y métricas de las oficinas que pasan los filtros de atributos"""
+    from office_index import department_counts, office_mask
+    from pipeline import add_density_metrics
     
-    folium.GeoJson(
-        all_data,
-        style_function=base_style_function,
-        tooltip=folium.GeoJsonTooltip(
-            fields=['DPTO_CNMBR', 'cantidad_oficinas'],
-            aliases=['Departamento: ', 'Oficinas: '],
-            localize=True
-        )
-    ).add_to(mapa)
+    data_unida, _ = load_and_process_data(artifact_version)
+    indice = load_office_index(artifact_version)
+    mascara = office_mask(indice, office_filter)
     
-    # SEGUNDA CAPA: Solo departamentos filtrados con colores según el tipo de mapa
-    if not filtered_data.empty and 'geometry' in filtered_data.columns and not filtered_data['geometry'].isnull().all():
-        if map_type == 'thematic':
-            # Mapa temático original con colores variados
-            colores_ylorrd_compacta = ['#7CFC00', '#FFFF00', '#FFA500', '#FF0000', '#800080']
-            valores_unicos = sorted(filtered_data['cantidad_oficinas'].unique())
-            color_dict = {valor: colores_ylorrd_compacta[i % len(colores_ylorrd_compacta)] 
-                         for i, valor in enumerate(valores_unicos)}
-            
-            def thematic_style_function(feature):
-                cantidad = feature['properties']['cantidad_oficinas']
-                return {
-                    'fillColor': color_dict.get(cantidad, '#CCCCCC'),
-                    'color': 'black',  
-                    'weight': 1.1,
-                    'fillOpacity': 0.6
-                }
-            
-            style_function = thematic_style_function
-            
-        else:  # Mapa con escala de azules
-            colores_azules = ["#9FBFFFFF", "#3E7DFBFF", "#0000FFE1", "#000080", '#FFFF00FF']
-            valores_unicos = sorted(filtered_data['cantidad_oficinas'].unique())
-            color_dict = {valor: colores_azules[i % len(colores_azules)] for i, valor in enumerate(valores_unicos)}
-            
-            def blues_style_function(feature):
-                cantidad = feature['properties']['cantidad_oficinas']
-                return {
-                    'fillColor': color_dict.get(cantidad, '#CCCCCC'),
-                    'color': 'black',  
-                    'weight': 1.1,
-                    'fillOpacity': 0.6
-                }
-            
-            style_function = blues_style_function
-        
-        # Añadir la segunda capa con los datos filtrados
-        folium.GeoJson(
-            filtered_data,
-            style_function=style_function,
-            tooltip=folium.GeoJsonTooltip(
-                fields=['DPTO_CNMBR', 'cantidad_oficinas'],
-                aliases=['Departamento: ', 'Oficinas: '],
-                localize=True
-            )
-        ).add_to(mapa)
+    # Copia superficial: la geometría se comparte con los datos globales
+    filtrados = data_unida.copy(deep=False)
+    filtrados['cantidad_oficinas'] = department_counts(indice, mascara)
+    filtrados = add_density_metrics(filtrados, data_unida.set_index('DPTO_CCDGO')['poblacion'])
+    return filtrados, int(mascara.sum())
+
+@st.cache_resource(max_entries=MAX_FILTROS_CACHE, show_spinner=False)
+def load_point_clusters(artifact_version=(), office_filter=()):
+    """Agrupar las oficinas en celdas por nivel de zoom, una vez por combinación de filtros"""
+    from office_index import office_mask
+    from pipeline import build_point_clusters
+    
+    _, df = load_and_process_data(artifact_version)
+    if df.empty or 'latitud_corregida' not in df.columns:
+        return pd.DataFrame(columns=['zoom', 'latitud', 'longitud', 'cantidad'])
     
-    return mapa
+    ubicadas = ~df['fuera_de_poligonos'].to_numpy(dtype=bool)
+    if office_filter:
+        ubicadas &= office_mask(load_office_index(artifact_version), office_filter)
+    return build_point_clusters(df['latitud_corregida'].to_numpy()[ubicadas], df['longitud_corregida'].to_numpy()[ubicadas])
+
+@st.cache_resource(max_entries=MAX_FILTROS_CACHE, show_spinner=False)
+def office_facts(artifact_version=(), office_filter=()):
+    """Tabla de hechos de las oficinas que pasan los filtros de atributos
 
-def create_top_departments_chart(data):
-    """Crear gráfico de top 7 departamentos"""
-    top_data = data.nlargest(7, 'cantidad_oficinas')
+    Sin filtros es la del artefacto; con filtros se recuenta sobre las oficinas seleccionadas.
+    """
+    from office_index import office_mask
+    from pipeline import build_office_facts, load_office_facts
     
-    # Colores específicos para cada categoría
-    color_map = {
-        20: '#800080',  # Morado para 20 oficinas
-        4: '#FF0000',   # Rojo para 4 oficinas
-        3: '#FFA500',   # Naranja para 3 oficinas
-        2: '#FFFF00',   # Amarillo para 2 oficinas
-        1: '#7CFC00'    # Verde para 1 oficina
-    }
+    _, df = load_and_process_data(artifact_version)
+    if df.empty or 'DPTO_CCDGO' not in df.columns:
+        return None
+    if office_filter:
+        return build_office_facts(df[office_mask(load_office_index(artifact_version), office_filter)])
+    try:
+        return load_office_facts()
+    except OSError:
+        # Artefacto sin escribir (sistema de archivos de solo lectura)
+        return build_office_facts(df)
+
+def data_key(data):
+    """Huella liviana de los datos que alimentan el mapa y los gráficos"""
+    return int(pd.util.hash_pandas_object(data[['DPTO_CNMBR', 'cantidad_oficinas']], index=False).sum())
+
+# Caché de renderizado compartida entre sesiones, con desalojo LRU
+MAX_MAPAS_CACHE = 32
+MAX_GRAFICOS_CACHE = 4
+
+# Servir departamentos y oficinas como teselas vectoriales desde `python tiles.py build`.
+# El servidor de teselas escucha en 127.0.0.1: solo sirve cuando el navegador corre en la misma máquina.
+# Toma un puerto libre, o FNA_PUERTO_TESELAS; si ese puerto ya sirve las teselas se reutiliza.
+TESELAS_VECTORIALES = os.environ.get('FNA_TESELAS_VECTORIALES') == '1'
+
+@st.cache_resource
+def tile_server():
+    """Iniciar una sola vez el servidor local de teselas y devolver su plantilla de URL"""
+    from tiles import start_tile_server
+    
+    return start_tile_server()
+
+def tile_server_url():
+    """Plantilla de URL de las teselas vigentes; None si no hay teselas compiladas
+
+    `?v=` cambia con cada compilación del MBTiles (`python pipeline.py actualizar` o
+    `python tiles.py build`): el navegador no reutiliza las teselas que guardó antes.
+    """
+    from tiles import MBTILES_PATH, tile_version
     
-    # Asignar colores basados en la cantidad de oficinas
-    colors = [color_map.get(x, '#CCCCCC') for x in top_data['cantidad_oficinas']]
+    version = tile_version(MBTILES_PATH)
+    if version is None:
+        return None
+    return f"{tile_server()}?v={version}"
+
+# Clave del componente del mapa en session_state
+CLAVE_MAPA = 'mapa'
+
+@st.cache_resource(max_entries=MAX_MAPAS_CACHE, show_spinner=False)
+def cached_map_component(artifact_version, zoom, tile_url=None):
+    """Mapa base (solo geometría) por nivel de detalle, ya renderizado a las cadenas del componente
+
+    La geometría se envía una sola vez; filtros y colores se aplican en el navegador
+    con la capa de estilos, que es lo único que se renderiza en cada rerun.
+    """
+    from visuals import create_folium_map, render_map_component
     
-    fig = px.bar(
-        top_data,
-        y='DPTO_CNMBR',
-        x='cantidad_oficinas',
-        orientation='h',
-        title='',
-        labels={'cantidad_oficinas': 'Número de Oficinas', 'DPTO_CNMBR': 'Departamento'}
-    )
+    datos_base, _ = load_and_process_data(artifact_version)
+    mapa = create_folium_map(datos_base, datos_base, None, zoom, client_side=True, tile_url=tile_url)
+    return render_map_component(mapa, CLAVE_MAPA)
+
+# Hilos compartidos por todas las sesiones del proceso para construir mapas mientras se pinta
+# el resto de la página. Con más sesiones que hilos los mapas esperan su turno en orden de llegada;
+# cada sesión tiene a lo sumo un mapa pendiente (submit_map cancela el de un rerun interrumpido).
+# Construir el mapa es sobre todo Python con el GIL: más hilos que núcleos no lo acelera.
+HILOS_MAPA = int(os.environ.get('FNA_HILOS_MAPA', min(4, os.cpu_count() or 1)))
+
+@st.cache_resource
+def map_executor():
+    """Pool de hilos para construir los mapas en segundo plano"""
+    return ThreadPoolExecutor(max_workers=HILOS_MAPA, thread_name_prefix='mapa')
+
+def build_map(data, artifact_version, map_type, metric, office_range, selected_regions, zoom, center, tile_url=None,
+              office_filter=()):
+    """Componente del mapa base en caché y capa de estilos renderizada de la vista actual"""
+    from visuals import clusters_for_view, create_style_layer, detail_zoom, filter_mask, render_style_layer
     
-    fig.update_traces(
-        marker_color=colors,
-        marker_line_color='rgb(8,48,107)',
-        marker_line_width=1.5
-    )
+    with metrics.stage('mapa.construir') as registro:
+        # La geometría base es la de los datos globales: los filtros de oficinas solo cambian conteos y colores
+        if tile_url:
+            # Geometría y oficinas por teselas: el mapa no cambia con el zoom ni los filtros.
+            # Las teselas traen los grupos de todas las oficinas; con filtros se envían los filtrados.
+            componente = cached_map_component(artifact_version, 5, tile_url)
+            puntos = None
+            if office_filter:
+                puntos = clusters_for_view(load_point_clusters(artifact_version, office_filter), zoom, center)
+        else:
+            # La geometría solo cambia con el nivel de detalle; filtros y colores viajan como diff
+            componente = cached_map_component(artifact_version, detail_zoom(zoom))
+            puntos = clusters_for_view(load_point_clusters(artifact_version, office_filter), zoom, center)
+        capa_estilos = render_style_layer(create_style_layer(
+            data,
+            filter_mask(data, office_range, selected_regions),
+            map_type,
+            puntos,
+            metric=metric
+        ))
+        if metrics.detailed():
+            registro['bytes'] = metrics.payload_size(componente['script']) + metrics.payload_size(capa_estilos['script'])
+    return componente, capa_estilos
+
+def submit_map(*args):
+    """Construir el mapa en el pool con el contexto del rerun actual (cachés y métricas)"""
+    contexto = get_script_run_ctx()
     
-    fig.update_layout(
-        plot_bgcolor='white',
-        yaxis={'categoryorder': 'total ascending'},
-        height=400,
-        margin=dict(l=20, r=20, t=20, b=20),
-        showlegend=False
-    )
+    def tarea():
+        add_script_run_ctx(ctx=contexto)
+        return build_map(*args)
     
-    return fig
+    # Un rerun interrumpido por otro cambio de widget ya no va a mostrar su mapa
+    anterior = st.session_state.get('_futuro_mapa')
+    if anterior is not None:
+        anterior.cancel()
+    futuro = map_executor().submit(tarea)
+    st.session_state['_futuro_mapa'] = futuro
+    return futuro
+
+def show_map(componente, capa_estilos, zoom, center, height=500):
+    """Entregar el mapa al componente de streamlit-folium con las cadenas ya renderizadas
 
-def create_distribution_chart(data):
-    """Crear gráfico de distribución"""
-    dist_data = data['cantidad_oficinas'].value_counts().sort_index()
+    Equivale a st_folium(..., feature_group_to_add=capa): el mapa base no se copia
+    ni se vuelve a renderizar, solo viaja el script de la capa de estilos.
+    """
+    from streamlit_folium import _component_func
     
-    # Colores específicos para el gráfico de torta
-    colores_torta = ['#7CFC00', '#FFFF00', '#FFA500', '#FF0000', '#800080']
+    def al_cambiar():
+        st.session_state[CLAVE_MAPA] = st.session_state.get(componente['clave'], {})
     
-    fig = px.pie(
-        values=dist_data.values,
-        names=[f"{int(x)} oficina(s)" for x in dist_data.index],
-        title='',
-        color_discrete_sequence=colores_torta
+    return _component_func(
+        script=componente['script'],
+        header=componente['header'],
+        html=componente['html'],
+        id=componente['id'],
+        key=componente['clave'],
+        height=height,
+        width=None,
+        returned_objects=['zoom', 'center'],
+        default={'zoom': componente['zoom']},
+        zoom=zoom,
+        center=center,
+        feature_group=capa_estilos['script'],
+        return_on_hover=False,
+        layer_control=None,
+        pixelated=False,
+        css_links=list(dict.fromkeys(componente['css_links'] + capa_estilos['css_links'])),
+        js_links=list(dict.fromkeys(componente['js_links'] + capa_estilos['js_links'])),
+        on_change=al_cambiar,
+        wrap_longitude=False,
     )
+
+@st.cache_resource(max_entries=MAX_GRAFICOS_CACHE)
+def cached_top_departments_chart(_data, data_version, metric='cantidad_oficinas'):
+    """Gráfico de top 7 reutilizado entre reruns: no depende de los filtros"""
+    from visuals import create_top_departments_chart
     
-    fig.update_traces(
-        textposition='inside',
-        textinfo='percent+label'
-    )
+    return create_top_departments_chart(_data, metric)
+
+@st.cache_resource(max_entries=MAX_GRAFICOS_CACHE)
+def cached_distribution_chart(_data, data_version, metric='cantidad_oficinas'):
+    """Gráfico de distribución reutilizado entre reruns: no depende de los filtros"""
+    from visuals import create_distribution_chart
     
-    fig.update_layout(
-        height=400,
-        showlegend=False,
-        margin=dict(l=20, r=20, t=20, b=20)
-    )
+    return create_distribution_chart(_data, metric)
+
+@st.cache_resource(max_entries=1)
+def load_accessibility(artifact_version=()):
+    """Distancia a la oficina más cercana por departamento, a partir de la rejilla de cobertura"""
+    from accessibility import coverage_summary, load_or_build_coverage
+    
+    data_unida, df = load_and_process_data(artifact_version)
+    if df.empty or 'fuera_de_poligonos' not in df.columns:
+        return pd.DataFrame()
+    
+    resumen = coverage_summary(load_or_build_coverage(data_unida, df))
+    resumen = resumen.join(data_unida.set_index('DPTO_CCDGO')['DPTO_CNMBR'])
+    return resumen.sort_values('distancia_media_km', ascending=False).reset_index(drop=True)
+
+def create_sample_data():
+    """Crear datos de ejemplo si hay error con los archivos"""
+    sample_data = {
+        'DPTO_CNMBR': ['BOGOTA, D.C.', 'ANTIOQUIA', 'VALLE DEL CAUCA', 'CUNDINAMARCA', 
+                      'SANTANDER', 'NARIÑO', 'TOLIMA', 'ATLANTICO', 'BOLIVAR', 'BOYACA'],
+        'cantidad_oficinas': [20, 4, 4, 4, 3, 3, 3, 2, 2, 2],
+        'geometry': [None] * 10
+    }
+    return pd.DataFrame(sample_data)
+
+# Por encima de este número de filas la tabla se muestra por páginas
+FILAS_POR_PAGINA = 500
+
+# Se guardan la página y su CSS, no un Styler: el Styler guarda estado al renderizarse
+# y no se comparte entre sesiones; cada rerun crea uno nuevo a partir de la caché
+@st.cache_resource(max_entries=MAX_GRAFICOS_CACHE)
+def cached_table_page(_data, data_version, page=0, page_size=FILAS_POR_PAGINA):
+    """Página de la tabla de detalle ya ordenada y el CSS de cada celda, reutilizados entre reruns"""
+    from visuals import style_dataframe
+    
+    table_data = _data[['DPTO_CNMBR', 'cantidad_oficinas']].sort_values('cantidad_oficinas', ascending=False)
+    pagina = table_data.iloc[page * page_size:(page + 1) * page_size]
+    return pagina, style_dataframe(pagina)
+
+@st.cache_resource
+def metrics_server_url():
+    """Iniciar una sola vez el endpoint de Prometheus si se configuró FNA_METRICAS_PUERTO"""
+    if not metrics.PUERTO_METRICAS:
+        return None
+    return metrics.start_metrics_server()
+
+def render_debug_panel(url_metricas=None):
+    """Panel del sidebar con tiempo, bytes y memoria de cada etapa"""
+    etapas = metrics.snapshot()
+    if not etapas:
+        return
+    
+    tabla = pd.DataFrame([
+        {
+            'Etapa': nombre,
+            'Última (ms)': etapa['ultima']['segundos'] * 1000,
+            'Promedio (ms)': etapa['segundos_total'] / etapa['llamadas'] * 1000,
+            'Bytes': etapa['ultima'].get('bytes'),
+            'Pico del proceso (KB)': etapa['ultima'].get('asignado_bytes', np.nan) / 1024,
+            'Llamadas': etapa['llamadas'],
+        }
+        for nombre, etapa in sorted(etapas.items())
+    ])
     
-    return fig
-
-def style_dataframe(row):
-    """Función corregida para aplicar estilos a cada fila"""
-    if row['cantidad_oficinas'] >= 4:
-        return ['background-color: #e8f5e8', 'background-color: #e8f5e8']
-    elif row['cantidad_oficinas'] == 3:
-        return ['background-color: #fff3cd', 'background-color: #fff3cd']
-    elif row['cantidad_oficinas'] == 2:
-        return ['background-color: #ffeaa7', 'background-color: #ffeaa7']
-    else:
-        return ['background-color: #f8f9fa', 'background-color: #f8f9fa']
+    with st.sidebar.expander("🛠️ Depuración: etapas", expanded=True):
+        st.dataframe(tabla, hide_index=True, use_container_width=True,
+                     column_config={c: st.column_config.NumberColumn(format='%.1f')
+                                    for c in ['Última (ms)', 'Promedio (ms)', 'Pico del proceso (KB)']})
+        if metrics.detailed():
+            st.caption("La memoria es el pico de todo el proceso durante la etapa (tracemalloc es global): "
+                       "incluye lo que asignan a la vez otras sesiones y el hilo del mapa.")
+        else:
+            st.caption("Bytes y memoria por etapa: iniciar el servidor con FNA_METRICAS=1.")
+        if url_metricas:
+            st.caption(f"Prometheus: {url_metricas}")
+
+# Secciones del dashboard; el análisis visual carga datos, mapa y gráficos
+SECCIONES = ["📋 Contexto y Metodología", "📊 Análisis Visual", "📈 Conclusiones"]
 
 def main():
+    # Panel de depuración con ?debug=1, solo para esta sesión. Bytes, memoria y logs por etapa
+    # son de todo el proceso y se activan al iniciar con FNA_METRICAS=1, no desde la URL.
+    depuracion = st.query_params.get('debug') == '1'
+    url_metricas = metrics_server_url()
+    
     # Header principal
     st.markdown("""
     <div class="main-header">
@@ -278,13 +380,17 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Cargar datos
-    data_unida_global, df_global = load_and_process_data()
-    
-    # Pestañas
-    tab1, tab2, tab3 = st.tabs(["📋 Contexto y Metodología", "📊 Análisis Visual", "📈 Conclusiones"])
+    # Navegación entre secciones: a diferencia de st.tabs, solo se ejecuta la sección elegida,
+    # así la primera carga no espera los datos ni las librerías geográficas del análisis visual
+    seccion = st.radio(
+        "Sección:",
+        options=SECCIONES,
+        horizontal=True,
+        label_visibility='collapsed',
+        key='seccion'
+    )
     
-    with tab1:
+    if seccion == SECCIONES[0]:
         st.markdown("""
         <div class="section-card">
             <h2 style="color: #2c3e50; margin-bottom: 20px; text-align: center;">Contexto del Estudio</h2>
@@ -329,15 +435,167 @@ def main():
         
         st.markdown("</div>", unsafe_allow_html=True)
     
-    with tab2:
+    if seccion == SECCIONES[2]:
+        st.markdown("""
+        <div class="section-card">
+            <h2 style="color: #2c3e50; margin-bottom: 25px; text-align: center;">
+                Interpretación de los Resultados y Conclusiones
+            </h2>
+        """, unsafe_allow_html=True)
+        
+
+        st.markdown("### Distribución de Oficinas del Fondo Nacional del Ahorro por Departamento")
+        
+        st.markdown("#### Regiones con Valores Más Altos:")
+        st.markdown("""
+        - **Bogotá D.C. domina ampliamente** con 20 oficinas, concentrando el mayor número a nivel nacional.
+        - **Región Andina Central**: Departamentos como Cundinamarca, Antioquia y Valle del Cauca presentan 4 oficinas cada uno, mostrando una presencia significativa.
+        - **Zonas Intermedias**: Tolima, Santander y Nariño tienen 3 oficinas cada uno, indicando una cobertura media-alta.
+        """)
+        
+        st.markdown("#### Desigualdades Territoriales Evidentes:")
+        st.markdown("""
+        - **Disparidad Extrema**: Bogotá tiene 20 veces más oficinas que la mayoría de departamentos (que solo tienen 1).
+        - **Centralismo Marcado**: La región central (Andina) concentra la mayoría de oficinas, mientras que:
+            - Región Caribe: Ningún departamento supera las 2 oficinas
+            - Región Pacífica: Chocó y Cauca solo tienen 1 oficina cada uno
+            - Región Amazónica: Amazonas, Guainía, Guaviare, Vaupés tienen solo 1 oficina para vastos territorios
+            - Región Orinoquía: Arauca, Casanare, Vichada con apenas 1 oficina cada uno
+        """)
+        
+        st.markdown("#### Factores Explicativos de las Diferencias:")
+        
+        st.markdown("##### Factores Demográficos y Económicos:")
+        st.markdown("""
+        - Densidad Poblacional: Bogotá y departamentos andinos tienen mayor población
+        - Desarrollo Económico: Regiones con mayor actividad económica demandan más servicios financieros
+        - Urbanización: Áreas urbanas concentran mayor demanda de créditos de vivienda
+        """)
+        
+        st.markdown("##### Factores Geográficos y Logísticos:")
+        st.markdown("""
+        - Accesibilidad: Departamentos remotos (Amazonas, Guainía) presentan desafíos de conectividad
+        - Extensión Territorial: Departamentos grandes con baja densidad (Vichada, Guaviare) tienen menor cobertura
+        """)
+        
+        st.markdown("##### Factores Institucionales y Históricos:")
+        st.markdown("""
+        - Enfoque de Mercado: Priorización de zonas con mayor potencial de cartera
+        - Infraestructura Existente: Limitaciones en instalación de oficinas en zonas periféricas
+        """)
+        
+        # Conclusión Principal
+        st.markdown("---")
+        st.markdown("#### Conclusión Principal")
+        st.info("""
+        **"La distribución refleja patrones históricos de desarrollo desigual en Colombia, donde las regiones centrales 
+        concentran la infraestructura financiera mientras las periféricas enfrentan limitaciones de acceso."**
+        """)
+        
+        st.markdown("---")
+        st.markdown("### La Georreferenciación como Herramienta Clave para el Análisis Social")
+        
+        st.markdown("""
+        El análisis georreferenciado de la distribución de oficinas del Fondo Nacional del Ahorro evidencia la 
+        **capacidad transformadora de los datos espaciales** en estudios sociales. La visualización espacial no solo permite identificar patrones geográficos de concentración y exclusión, sino que 
+        **revela dimensiones críticas del desarrollo territorial** que pasarían desapercibidas en análisis tabulares convencionales.
+        """)
+        
+        st.markdown("""
+        La georreferenciación **materializa las desigualdades**, transformando datos abstractos en realidades tangibles: muestra cómo el centralismo bogotano se impone sobre las periferias, cómo la región Caribe a pesar de su extensión y población mantiene una cobertura marginal, y cómo la Amazonia y Orinoquia enfrentan desafíos de inclusión financiera proporcionales a su vastedad territorial.
+        """)
+        
+        st.markdown("""
+        Este ejercicio demuestra que **la geografía no es solo un contenedor de fenómenos sociales, sino un factor activo** que configura oportunidades de acceso. La disposición espacial de la infraestructura financiera refleja y, a la vez, reproduce dinámicas de desarrollo desigual, haciendo evidente la 
+        **necesidad de políticas públicas con enfoque territorial diferenciado**.
+        """)
+        
+        st.markdown("#### Aportes de la Georreferenciación para la Equidad")
+        st.markdown("""
+        - Identificar brechas de cobertura con precisión
+        - Priorizar inversiones en territorios históricamente marginados  
+        - Diseñar estrategias adaptadas a las realidades regionales
+        - Evaluar impactos de políticas con dimensión espacial
+        """)
+        
+        st.markdown("</div>", unsafe_allow_html=True)
+    
+    if seccion == SECCIONES[1]:
+        from visuals import metric_legend
+        from pipeline import METRICAS, artifact_version
+        from office_index import ATRIBUTOS_OFICINA
+        
+        # Cargar datos; una actualización del artefacto (`python pipeline.py actualizar`) invalida las cachés
+        version_artefacto = artifact_version()
+        with metrics.stage('datos.cargar'):
+            data_unida_global, df_global = load_and_process_data(version_artefacto)
+        
         if data_unida_global is not None and not data_unida_global.empty:
+            # Filtros en sidebar
+            st.sidebar.header("Controles de Visualización")
+            
+            map_type = st.sidebar.selectbox(
+                "Tipo de Mapa:",
+                options=['🎨 Mapa Temático (Escala de Colores)', '🔵 Mapa Temático (Escala de Azules)'],
+                index=0
+            )
+            
+            map_type_value = 'thematic' if 'Colores' in map_type else 'blues'
+            
+            # Métricas precalculadas en el artefacto: cambiar de métrica solo cambia los colores
+            metricas_disponibles = [
+                m for m in METRICAS if m in data_unida_global.columns and data_unida_global[m].notna().any()
+            ]
+            metrica = st.sidebar.selectbox(
+                "Métrica:",
+                options=metricas_disponibles,
+                format_func=METRICAS.get,
+                index=0
+            )
+            
+            office_range = st.sidebar.slider(
+                "Filtrar por Número de Oficinas:",
+                min_value=1,
+                max_value=20,
+                value=(1, 20),
+                step=1
+            )
+            
+            region_options = sorted(data_unida_global['DPTO_CNMBR_NORM'].unique())
+            selected_regions = st.sidebar.multiselect(
+                "Filtrar por Región:",
+                options=region_options,
+                placeholder="Seleccione regiones..."
+            )
+            
+            # Filtros por atributos de las oficinas: recuentan las oficinas de cada departamento
+            indice_oficinas = load_office_index(version_artefacto)
+            filtro_oficinas = []
+            if indice_oficinas is not None and indice_oficinas['atributos']:
+                st.sidebar.subheader("Filtrar Oficinas")
+                for columna, atributo in indice_oficinas['atributos'].items():
+                    seleccion = st.sidebar.multiselect(
+                        f"{ATRIBUTOS_OFICINA[columna]}:",
+                        options=atributo['valores'],
+                        placeholder="Todos"
+                    )
+                    if seleccion:
+                        filtro_oficinas.append((columna, tuple(sorted(seleccion))))
+            filtro_oficinas = tuple(filtro_oficinas)
+            
+            if st.sidebar.button("🔄 Resetear Filtros"):
+                st.rerun()
+            
+            total_oficinas = int(df_global.shape[0]) if not df_global.empty else 71
+            if filtro_oficinas:
+                data_unida_global, total_oficinas = filtered_office_data(version_artefacto, filtro_oficinas)
+            
             # Estadísticas clave
             col1, col2, col3, col4 = st.columns(4)
             
-            total_oficinas = int(df_global.shape[0]) if not df_global.empty else 71
             total_departamentos = len(data_unida_global[data_unida_global['cantidad_oficinas'] > 0])
             max_oficinas = int(data_unida_global['cantidad_oficinas'].max())
-            min_oficinas = int(data_unida_global[data_unida_global['cantidad_oficinas'] > 0]['cantidad_oficinas'].min())
+            min_oficinas = int(data_unida_global[data_unida_global['cantidad_oficinas'] > 0]['cantidad_oficinas'].min()) if total_departamentos else 0
             
             with col1:
                 st.markdown(f"""
@@ -371,45 +629,7 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
             
-            # Filtros en sidebar
-            st.sidebar.header("Controles de Visualización")
-            
-            map_type = st.sidebar.selectbox(
-                "Tipo de Mapa:",
-                options=['🎨 Mapa Temático (Escala de Colores)', '🔵 Mapa Temático (Escala de Azules)'],
-                index=0
-            )
-            
-            map_type_value = 'thematic' if 'Colores' in map_type else 'blues'
-            
-            office_range = st.sidebar.slider(
-                "Filtrar por Número de Oficinas:",
-                min_value=1,
-                max_value=20,
-                value=(1, 20),
-                step=1
-            )
-            
-            region_options = sorted(data_unida_global['DPTO_CNMBR_NORM'].unique())
-            selected_regions = st.sidebar.multiselect(
-                "Filtrar por Región:",
-                options=region_options,
-                placeholder="Seleccione regiones..."
-            )
-            
-            if st.sidebar.button("🔄 Resetear Filtros"):
-                st.rerun()
-            
-            # Aplicar filtros
-            filtered_data = data_unida_global.copy()
-            
-            if selected_regions:
-                filtered_data = filtered_data[filtered_data['DPTO_CNMBR_NORM'].isin(selected_regions)]
-            
-            filtered_data = filtered_data[
-                (filtered_data['cantidad_oficinas'] >= office_range[0]) & 
-                (filtered_data['cantidad_oficinas'] <= office_range[1])
-            ]
+            version_datos = hash((version_artefacto, filtro_oficinas, data_key(data_unida_global)))
             
             # Mapa y controles 
             col_map, col_info = st.columns([70, 30])
@@ -421,29 +641,58 @@ def main():
                     <div style="padding: 1rem;">
                 """, unsafe_allow_html=True)
                 
-                mapa = create_folium_map(data_unida_global, filtered_data, map_type_value)
-                st_folium(mapa, width=None, height=500, use_container_width=True)
+                zoom = st.session_state.get('map_zoom', 5)
+                center = st.session_state.get('map_center', (4.5709, -74.2973))
+                
+                # El mapa se construye en segundo plano y se entrega al final del rerun:
+                # gráficos y tabla se pintan sin esperar la geometría
+                futuro_mapa = submit_map(
+                    data_unida_global, version_artefacto, map_type_value, metrica,
+                    office_range, selected_regions, zoom, center,
+                    tile_server_url() if TESELAS_VECTORIALES else None,
+                    filtro_oficinas
+                )
+                espacio_mapa = st.empty()
+                espacio_mapa.info("🗺️ Cargando mapa...")
                 
                 st.markdown("</div></div>", unsafe_allow_html=True)
             
             with col_info:
-                st.markdown("""
-                <div class="section-card">
-                    <div class="section-header">Leyenda del Mapa</div>
-                    <div style="padding: 1.5rem;">
-                        <p><strong>Cantidad de Oficinas:</strong></p>
-                        <p>🟢 1 oficina<br>
-                        🟡 2 oficinas<br>
-                        🟠 3 oficinas<br>
-                        🔴 4 oficinas<br>
-                        🟣 20 oficinas (Bogotá)<br>
-                        ⚪ Otros departamentos</p>
-                        <p style="margin-top: 20px; font-size: 0.9rem; color: #666;">
-                        <em>Use los controles en el sidebar para filtrar los datos del mapa.</em>
-                        </p>
+                if metrica != 'cantidad_oficinas':
+                    clases = ''.join(
+                        f'<span style="color: {color};">■</span> {etiqueta}<br>'
+                        for color, etiqueta in metric_legend(data_unida_global[metrica], map_type_value)
+                    )
+                    st.markdown(f"""
+                    <div class="section-card">
+                        <div class="section-header">Leyenda del Mapa</div>
+                        <div style="padding: 1.5rem;">
+                            <p><strong>{METRICAS[metrica]}:</strong></p>
+                            <p>{clases}
+                            ⚪ Otros departamentos o sin dato<br>
+                            ⚫ Oficinas (agrupadas por cercanía)</p>
+                        </div>
                     </div>
-                </div>
-                """, unsafe_allow_html=True)
+                    """, unsafe_allow_html=True)
+                else:
+                    st.markdown("""
+                    <div class="section-card">
+                        <div class="section-header">Leyenda del Mapa</div>
+                        <div style="padding: 1.5rem;">
+                            <p><strong>Cantidad de Oficinas:</strong></p>
+                            <p>🟢 1 oficina<br>
+                            🟡 2 oficinas<br>
+                            🟠 3 oficinas<br>
+                            🔴 4 oficinas<br>
+                            🟣 20 oficinas (Bogotá)<br>
+                            ⚪ Otros departamentos<br>
+                            ⚫ Oficinas (agrupadas por cercanía)</p>
+                            <p style="margin-top: 20px; font-size: 0.9rem; color: #666;">
+                            <em>Use los controles en el sidebar para filtrar los datos del mapa.</em>
+                            </p>
+                        </div>
+                    </div>
+                    """, unsafe_allow_html=True)
             
             # Gráficos 
             st.markdown('<div style="margin-top: 2rem;">', unsafe_allow_html=True)
@@ -455,8 +704,11 @@ def main():
                     <div class="section-header">Top 7 Departamentos con Más Oficinas</div>
                     <div style="padding: 1rem;">
                 """, unsafe_allow_html=True)
-                top_chart = create_top_departments_chart(data_unida_global)
-                st.plotly_chart(top_chart, use_container_width=True)
+                with metrics.stage('graficos.top7') as registro:
+                    top_chart = cached_top_departments_chart(data_unida_global, version_datos, metrica)
+                    st.plotly_chart(top_chart, use_container_width=True)
+                    if metrics.detailed():
+                        registro['bytes'] = metrics.payload_size(top_chart.to_json())
                 st.markdown("</div></div>", unsafe_allow_html=True)
             
             with col_chart2:
@@ -465,8 +717,11 @@ def main():
                     <div class="section-header">Distribución por Número de Oficinas</div>
                     <div style="padding: 1rem;">
                 """, unsafe_allow_html=True)
-                dist_chart = create_distribution_chart(data_unida_global)
-                st.plotly_chart(dist_chart, use_container_width=True)
+                with metrics.stage('graficos.distribucion') as registro:
+                    dist_chart = cached_distribution_chart(data_unida_global, version_datos, metrica)
+                    st.plotly_chart(dist_chart, use_container_width=True)
+                    if metrics.detailed():
+                        registro['bytes'] = metrics.payload_size(dist_chart.to_json())
                 st.markdown("</div></div>", unsafe_allow_html=True)
             st.markdown('</div>', unsafe_allow_html=True)
             
@@ -477,102 +732,111 @@ def main():
                 <div style="padding: 1rem;">
             """, unsafe_allow_html=True)
             
-            table_data = data_unida_global[['DPTO_CNMBR', 'cantidad_oficinas']].sort_values('cantidad_oficinas', ascending=False)
-            
-            # Aplicar estilos a la tabla
-            styled_df = table_data.style.apply(style_dataframe, axis=1)
+            # Paginar cuando la tabla tiene miles de filas (oficinas o municipios)
+            total_paginas = -(-len(data_unida_global) // FILAS_POR_PAGINA)
+            pagina = 1
+            if total_paginas > 1:
+                pagina = st.number_input("Página:", min_value=1, max_value=total_paginas, value=1, step=1)
             
-            st.dataframe(styled_df, width='stretch', height=400)
+            with metrics.stage('tabla.estilos'):
+                tabla_pagina, estilos_tabla = cached_table_page(data_unida_global, version_datos, int(pagina) - 1)
+                styled_df = tabla_pagina.style.apply(lambda _: estilos_tabla, axis=None)
+                
+                st.dataframe(styled_df, width='stretch', height=400)
             
             st.markdown("</div></div>", unsafe_allow_html=True)
+            
+            # Entregar el mapa en su lugar cuando termine de construirse
+            componente_mapa, capa_estilos = futuro_mapa.result()
+            with espacio_mapa.container(), metrics.stage('mapa.st_folium'):
+                estado_mapa = show_map(componente_mapa, capa_estilos, zoom, center)
+            
+            # Guardar la vista actual para elegir el nivel de detalle en el siguiente rerun
+            if estado_mapa and estado_mapa.get('zoom'):
+                st.session_state['map_zoom'] = estado_mapa['zoom']
+                if estado_mapa.get('center'):
+                    st.session_state['map_center'] = (estado_mapa['center']['lat'], estado_mapa['center']['lng'])
+            
+            # Desglose territorial a partir de los rollups de la tabla de hechos, sin volver a unir oficinas y capas
+            hechos = office_facts(version_artefacto, filtro_oficinas)
+            if hechos is not None and not hechos.empty:
+                from pipeline import rollup
+                
+                st.markdown("""
+                <div class="section-card">
+                    <div class="section-header">🔎 Desglose por Regional y Municipio</div>
+                    <div style="padding: 1rem;">
+                """, unsafe_allow_html=True)
+                
+                col_regional, col_municipio = st.columns(2)
+                with col_regional:
+                    por_regional = rollup(hechos, 'regional').sort_values(ascending=False).reset_index()
+                    st.dataframe(
+                        por_regional,
+                        column_config={'regional': 'Regional', 'cantidad_oficinas': 'Oficinas'},
+                        hide_index=True,
+                        use_container_width=True,
+                        height=400
+                    )
+                
+                with col_municipio:
+                    por_departamento = rollup(hechos, 'departamento')
+                    nombres = data_unida_global.set_index('DPTO_CCDGO')['DPTO_CNMBR']
+                    departamento = st.selectbox(
+                        "Departamento:",
+                        options=sorted(por_departamento.index, key=lambda codigo: nombres.get(codigo, codigo)),
+                        format_func=lambda codigo: nombres.get(codigo, codigo)
+                    )
+                    if hechos['municipio'].notna().any():
+                        por_municipio = rollup(hechos[hechos['departamento'] == departamento], 'municipio')
+                        por_municipio = por_municipio.sort_values(ascending=False).reset_index()
+                        sin_municipio = int(por_departamento[departamento] - por_municipio['cantidad_oficinas'].sum())
+                        st.dataframe(
+                            por_municipio,
+                            column_config={'municipio': 'Municipio (código DANE)', 'cantidad_oficinas': 'Oficinas'},
+                            hide_index=True,
+                            use_container_width=True,
+                            height=330
+                        )
+                        if sin_municipio:
+                            st.caption(f"{sin_municipio} oficinas del departamento no caen en ningún municipio.")
+                    else:
+                        st.info("Sin la capa municipal del MGN en data/ no hay desglose por municipio.")
+                
+                st.markdown("</div></div>", unsafe_allow_html=True)
+            
+            # Accesibilidad: distancia en línea recta a la oficina más cercana. Va después de entregar
+            # el mapa: la primera vez calcula la rejilla de cobertura y no debe retrasarlo
+            accesibilidad = load_accessibility(version_artefacto)
+            if not accesibilidad.empty:
+                st.markdown("""
+                <div class="section-card">
+                    <div class="section-header">📍 Distancia a la Oficina Más Cercana</div>
+                    <div style="padding: 1rem;">
+                """, unsafe_allow_html=True)
+                
+                st.dataframe(
+                    accesibilidad[['DPTO_CNMBR', 'distancia_media_km', 'distancia_maxima_km', 'area_a_mas_de_50_km']],
+                    column_config={
+                        'DPTO_CNMBR': 'Departamento',
+                        'distancia_media_km': st.column_config.NumberColumn('Distancia media (km)', format='%.1f'),
+                        'distancia_maxima_km': st.column_config.NumberColumn('Distancia máxima (km)', format='%.1f'),
+                        'area_a_mas_de_50_km': st.column_config.ProgressColumn('Área a más de 50 km', min_value=0, max_value=1, format='%.2f'),
+                    },
+                    hide_index=True,
+                    use_container_width=True,
+                    height=400
+                )
+                st.caption("Distancia de gran círculo desde cada celda de una rejilla de 0,05° hasta la oficina más cercana.")
+                
+                st.markdown("</div></div>", unsafe_allow_html=True)
         
         else:
             st.error("No se pudieron cargar los datos. Verifique que los archivos estén en la carpeta 'data/'")
     
-    with tab3:
-        st.markdown("""
-        <div class="section-card">
-            <h2 style="color: #2c3e50; margin-bottom: 25px; text-align: center;">
-                Interpretación de los Resultados y Conclusiones
-            </h2>
-        """, unsafe_allow_html=True)
-        
-
-        st.markdown("### Distribución de Oficinas del Fondo Nacional del Ahorro por Departamento")
-        
-        st.markdown("#### Regiones con Valores Más Altos:")
-        st.markdown("""
-        - **Bogotá D.C. domina ampliamente** con 20 oficinas, concentrando el mayor número a nivel nacional.
-        - **Región Andina Central**: Departamentos como Cundinamarca, Antioquia y Valle del Cauca presentan 4 oficinas cada uno, mostrando una presencia significativa.
-        - **Zonas Intermedias**: Tolima, Santander y Nariño tienen 3 oficinas cada uno, indicando una cobertura media-alta.
-        """)
-        
-        st.markdown("#### Desigualdades Territoriales Evidentes:")
-        st.markdown("""
-        - **Disparidad Extrema**: Bogotá tiene 20 veces más oficinas que la mayoría de departamentos (que solo tienen 1).
-        - **Centralismo Marcado**: La región central (Andina) concentra la mayoría de oficinas, mientras que:
-            - Región Caribe: Ningún departamento supera las 2 oficinas
-            - Región Pacífica: Chocó y Cauca solo tienen 1 oficina cada uno
-            - Región Amazónica: Amazonas, Guainía, Guaviare, Vaupés tienen solo 1 oficina para vastos territorios
-            - Región Orinoquía: Arauca, Casanare, Vichada con apenas 1 oficina cada uno
-        """)
-        
-        st.markdown("#### Factores Explicativos de las Diferencias:")
-        
-        st.markdown("##### Factores Demográficos y Económicos:")
-        st.markdown("""
-        - Densidad Poblacional: Bogotá y departamentos andinos tienen mayor población
-        - Desarrollo Económico: Regiones con mayor actividad económica demandan más servicios financieros
-        - Urbanización: Áreas urbanas concentran mayor demanda de créditos de vivienda
-        """)
-        
-        st.markdown("##### Factores Geográficos y Logísticos:")
-        st.markdown("""
-        - Accesibilidad: Departamentos remotos (Amazonas, Guainía) presentan desafíos de conectividad
-        - Extensión Territorial: Departamentos grandes con baja densidad (Vichada, Guaviare) tienen menor cobertura
-        """)
-        
-        st.markdown("##### Factores Institucionales y Históricos:")
-        st.markdown("""
-        - Enfoque de Mercado: Priorización de zonas con mayor potencial de cartera
-        - Infraestructura Existente: Limitaciones en instalación de oficinas en zonas periféricas
-        """)
-        
-        # Conclusión Principal
-        st.markdown("---")
-        st.markdown("#### Conclusión Principal")
-        st.info("""
-        **"La distribución refleja patrones históricos de desarrollo desigual en Colombia, donde las regiones centrales 
-        concentran la infraestructura financiera mientras las periféricas enfrentan limitaciones de acceso."**
-        """)
-        
-        st.markdown("---")
-        st.markdown("### La Georreferenciación como Herramienta Clave para el Análisis Social")
-        
-        st.markdown("""
-        El análisis georreferenciado de la distribución de oficinas del Fondo Nacional del Ahorro evidencia la 
-        **capacidad transformadora de los datos espaciales** en estudios sociales. La visualización espacial no solo permite identificar patrones geográficos de concentración y exclusión, sino que 
-        **revela dimensiones críticas del desarrollo territorial** que pasarían desapercibidas en análisis tabulares convencionales.
-        """)
-        
-        st.markdown("""
-        La georreferenciación **materializa las desigualdades**, transformando datos abstractos en realidades tangibles: muestra cómo el centralismo bogotano se impone sobre las periferias, cómo la región Caribe a pesar de su extensión y población mantiene una cobertura marginal, y cómo la Amazonia y Orinoquia enfrentan desafíos de inclusión financiera proporcionales a su vastedad territorial.
-        """)
-        
-        st.markdown("""
-        Este ejercicio demuestra que **la geografía no es solo un contenedor de fenómenos sociales, sino un factor activo** que configura oportunidades de acceso. La disposición espacial de la infraestructura financiera refleja y, a la vez, reproduce dinámicas de desarrollo desigual, haciendo evidente la 
-        **necesidad de políticas públicas con enfoque territorial diferenciado**.
-        """)
-        
-        st.markdown("#### Aportes de la Georreferenciación para la Equidad")
-        st.markdown("""
-        - Identificar brechas de cobertura con precisión
-        - Priorizar inversiones en territorios históricamente marginados  
-        - Diseñar estrategias adaptadas a las realidades regionales
-        - Evaluar impactos de políticas con dimensión espacial
-        """)
-        
-        st.markdown("</div>", unsafe_allow_html=True)
+    if depuracion:
+        render_debug_panel(url_metricas)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    with metrics.stage('app.rerun'):
+        main()
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""Tiempo de arranque en frío de los módulos del dashboard.
+
+Cada medición importa el módulo en un intérprete nuevo, así que incluye todo su
+grafo de dependencias. Con --limite el comando falla si la mediana supera el
+límite, para detectar regresiones en el arranque.
+
+Uso:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeticiones 9 --limite app=1.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# app debe quedar liviano; visuals concentra GeoPandas, Folium y Plotly
+MODULOS = ('app', 'pipeline', 'visuals')
+
+CODIGO_MEDICION = """
+import sys, time, warnings
+warnings.filterwarnings("ignore")
+inicio = time.perf_counter()
+__import__(sys.argv[1])
+print(time.perf_counter() - inicio)
+"""
+
+def import_seconds(modulo):
+    """Segundos que toma importar un módulo en un intérprete nuevo"""
+    salida = subprocess.run(
+        [sys.executable, '-c', CODIGO_MEDICION, modulo],
+        cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+    return float(salida.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempo de importación en frío de los módulos del dashboard")
+    parser.add_argument('modulos', nargs='*', default=list(MODULOS))
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--limite', action='append', default=[], metavar='MODULO=SEGUNDOS',
+                        help="Fallar si la mediana del módulo supera este límite")
+    args = parser.parse_args(argv)
+
+    limites = {modulo: float(segundos) for modulo, segundos in (limite.split('=') for limite in args.limite)}
+
+    resultados = {}
+    for modulo in args.modulos:
+        tiempos = [import_seconds(modulo) for _ in range(args.repeticiones)]
+        resultados[modulo] = {
+            'mediana_s': round(statistics.median(tiempos), 4),
+            'min_s': round(min(tiempos), 4),
+            'max_s': round(max(tiempos), 4),
+        }
+    print(json.dumps(resultados, indent=2))
+
+    excedidos = [m for m, limite in limites.items() if m in resultados and resultados[m]['mediana_s'] > limite]
+    for modulo in excedidos:
+        print(f"{modulo}: {resultados[modulo]['mediana_s']} s supera el límite de {limites[modulo]} s", file=sys.stderr)
+    return 1 if excedidos else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
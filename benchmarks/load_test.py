@@ -0,0 +1,298 @@
+"""Prueba de carga del dashboard con sesiones concurrentes contra un servidor local.
+
+Levanta `streamlit run app.py` en un puerto libre (o usa uno ya corriendo con
+--url) y abre N sesiones por websocket, hablando el mismo protocolo que el
+navegador: cada rerun envía el estado de los widgets y termina cuando el
+servidor reporta el fin del script. Cada sesión carga la página, abre la
+sección de análisis visual y repite acciones del sidebar (rango de oficinas,
+tipo de mapa, métrica, regiones, filtros por atributos de las oficinas y el
+botón de resetear).
+
+Por cada número de sesiones se reporta la latencia p50/p95 de los reruns, los
+reruns por segundo del servidor, los bytes recibidos por rerun y el pico de
+memoria residente del worker. No ejecuta el JavaScript de la página: el tiempo
+de dibujar el mapa en el navegador no se incluye.
+
+Uso (desde la raíz del repositorio, con los datos en data/):
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --sesiones 1 5 10 20 --acciones 30 --salida carga.json
+    python benchmarks/load_test.py --url ws://127.0.0.1:8501/_stcore/stream --pid 12345
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+from tornado.websocket import websocket_connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from office_index import ATRIBUTOS_OFICINA
+
+SESIONES_POR_DEFECTO = (1, 2, 5, 10)
+
+# Intervalo de muestreo de la memoria residente del servidor
+INTERVALO_MEMORIA_S = 0.05
+
+# El mapa y los gráficos viajan en mensajes de varios MB
+TAMANO_MAXIMO_MENSAJE = 512 * 2 ** 20
+
+def rss_mb(pid):
+    """Memoria residente de un proceso en MB (Linux); None si no se puede leer"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, TypeError):
+        return None
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(app_path, puerto, espera_s=120):
+    """Levantar `streamlit run` sin navegador y esperar a que responda el health check"""
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', app_path,
+         '--server.headless', 'true', '--server.port', str(puerto), '--browser.gatherUsageStats', 'false'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    limite = time.monotonic() + espera_s
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"streamlit run terminó con código {proceso.returncode}")
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{puerto}/_stcore/health', timeout=1) as respuesta:
+                if respuesta.status == 200:
+                    return proceso
+        except OSError:
+            time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError(f"El servidor no respondió en {espera_s} s")
+
+class Session:
+    """Una sesión del navegador: conexión, widgets vistos y su estado actual"""
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.widgets = {}
+        self.estados = {}
+
+    async def __aenter__(self):
+        self.conexion = await websocket_connect(self.url, max_message_size=TAMANO_MAXIMO_MENSAJE)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.conexion.close()
+
+    async def rerun(self, disparador=None):
+        """Enviar el estado de los widgets y esperar el fin del script; devuelve bytes y excepciones"""
+        mensaje = BackMsg()
+        estados = list(self.estados.values()) + ([disparador] if disparador else [])
+        mensaje.rerun_script.widget_states.widgets.extend(estados)
+        await self.conexion.write_message(mensaje.SerializeToString(), binary=True)
+        return await asyncio.wait_for(self._read_until_finished(), self.timeout)
+
+    async def _read_until_finished(self):
+        recibidos, excepciones = 0, []
+        while True:
+            datos = await self.conexion.read_message()
+            if datos is None:
+                raise ConnectionError("El servidor cerró la conexión")
+            recibidos += len(datos)
+            mensaje = ForwardMsg()
+            mensaje.ParseFromString(datos)
+            tipo = mensaje.WhichOneof('type')
+            if tipo == 'delta' and mensaje.delta.WhichOneof('type') == 'new_element':
+                elemento = mensaje.delta.new_element
+                clase = elemento.WhichOneof('type')
+                if clase in ('slider', 'selectbox', 'multiselect', 'button', 'radio'):
+                    self.widgets[getattr(elemento, clase).label] = getattr(elemento, clase)
+                elif clase == 'exception':
+                    excepciones.append(elemento.exception.message)
+            elif tipo == 'script_finished' and mensaje.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                # Con st.rerun() el primer script termina antes de tiempo y llega otro
+                return recibidos, excepciones
+
+    def set_state(self, etiqueta, **valor):
+        """Fijar el valor de un widget por su etiqueta para los siguientes reruns"""
+        estado = WidgetState(id=self.widgets[etiqueta].id)
+        for campo, dato in valor.items():
+            if campo.endswith('_array_value'):
+                getattr(estado, campo).data.extend(dato)
+            else:
+                setattr(estado, campo, dato)
+        self.estados[estado.id] = estado
+
+def open_visual_section(sesion):
+    """Elegir la sección de análisis visual, la única que carga datos, mapa y controles"""
+    opciones = sesion.widgets["Sección:"].options
+    sesion.set_state("Sección:", int_value=next(i for i, opcion in enumerate(opciones) if 'Análisis Visual' in opcion))
+
+# Acciones de una sesión sobre los controles del sidebar: devuelven un disparador o None
+def change_range(sesion, rng):
+    minimo = int(rng.integers(1, 20))
+    sesion.set_state("Filtrar por Número de Oficinas:", double_array_value=[minimo, int(rng.integers(minimo, 21))])
+
+def change_map_type(sesion, rng):
+    opciones = sesion.widgets["Tipo de Mapa:"].options
+    sesion.set_state("Tipo de Mapa:", int_value=int(rng.integers(len(opciones))))
+
+def change_metric(sesion, rng):
+    opciones = sesion.widgets["Métrica:"].options
+    sesion.set_state("Métrica:", int_value=int(rng.integers(len(opciones))))
+
+def change_regions(sesion, rng):
+    opciones = sesion.widgets["Filtrar por Región:"].options
+    indices = rng.choice(len(opciones), int(rng.integers(0, 4)), replace=False)
+    sesion.set_state("Filtrar por Región:", int_array_value=sorted(int(i) for i in indices))
+
+def change_office_filters(sesion, rng):
+    # Solo aparecen los atributos con más de un valor en los datos cargados
+    etiquetas = [f"{etiqueta}:" for etiqueta in ATRIBUTOS_OFICINA.values() if f"{etiqueta}:" in sesion.widgets]
+    if not etiquetas:
+        return
+    etiqueta = etiquetas[int(rng.integers(len(etiquetas)))]
+    opciones = sesion.widgets[etiqueta].options
+    indices = rng.choice(len(opciones), int(rng.integers(0, min(3, len(opciones)) + 1)), replace=False)
+    sesion.set_state(etiqueta, int_array_value=sorted(int(i) for i in indices))
+
+def reset_filters(sesion, rng):
+    return WidgetState(id=sesion.widgets["🔄 Resetear Filtros"].id, trigger_value=True)
+
+ACCIONES = {
+    'rango': change_range,
+    'tipo_mapa': change_map_type,
+    'metrica': change_metric,
+    'regiones': change_regions,
+    'oficinas': change_office_filters,
+    'resetear': reset_filters,
+}
+
+async def run_session(url, acciones, semilla, timeout):
+    """Cargar la página y ejecutar acciones al azar midiendo cada rerun"""
+    rng = np.random.default_rng(semilla)
+    resultado = {'carga_s': None, 'reruns_s': [], 'bytes': [], 'errores': 0, 'fallos': []}
+
+    try:
+        async with Session(url, timeout) as sesion:
+            async def medir(nombre, disparador=None):
+                inicio = time.perf_counter()
+                recibidos, excepciones = await sesion.rerun(disparador)
+                resultado['bytes'].append(recibidos)
+                if excepciones:
+                    resultado['errores'] += 1
+                    resultado['fallos'].append(f"{nombre}: {excepciones[0]}")
+                return time.perf_counter() - inicio
+
+            # La carga incluye abrir el análisis visual: la primera página solo trae texto
+            resultado['carga_s'] = await medir('carga')
+            open_visual_section(sesion)
+            resultado['carga_s'] += await medir('analisis_visual')
+            for _ in range(acciones):
+                nombre = list(ACCIONES)[int(rng.integers(len(ACCIONES)))]
+                if nombre == 'metrica' and "Métrica:" not in sesion.widgets:
+                    continue
+                disparador = ACCIONES[nombre](sesion, rng)
+                resultado['reruns_s'].append(await medir(nombre, disparador))
+    except (asyncio.TimeoutError, ConnectionError, OSError, KeyError) as e:
+        # Un rerun que excede el timeout, una desconexión o un widget ausente terminan la sesión
+        resultado['errores'] += 1
+        resultado['fallos'].append(f"{type(e).__name__}: {e}")
+    return resultado
+
+async def run_level(url, sesiones, acciones, timeout, pid=None, semilla=0):
+    """Correr `sesiones` sesiones a la vez y resumir latencia, throughput y memoria"""
+    pico = [rss_mb(pid)]
+    terminado = asyncio.Event()
+
+    async def muestrear():
+        while not terminado.is_set():
+            pico.append(rss_mb(pid))
+            await asyncio.sleep(INTERVALO_MEMORIA_S)
+
+    monitor = asyncio.create_task(muestrear())
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(run_session(url, acciones, semilla + i, timeout) for i in range(sesiones)))
+    duracion = time.perf_counter() - inicio
+    terminado.set()
+    await monitor
+
+    reruns = np.array([s for r in resultados for s in r['reruns_s']])
+    cargas = np.array([r['carga_s'] for r in resultados if r['carga_s'] is not None])
+    recibidos = [b for r in resultados for b in r['bytes']]
+    memoria = [m for m in pico if m is not None]
+    # Cada carga son dos reruns: la página y la sección de análisis visual
+    total = len(reruns) + 2 * len(cargas)
+
+    def percentil(valores, q):
+        return round(float(np.percentile(valores, q)), 4) if len(valores) else None
+
+    return {
+        'sesiones': sesiones,
+        'reruns': int(total),
+        'errores': sum(r['errores'] for r in resultados),
+        'carga_p50_s': percentil(cargas, 50),
+        'rerun_p50_s': percentil(reruns, 50),
+        'rerun_p95_s': percentil(reruns, 95),
+        'rerun_max_s': round(float(reruns.max()), 4) if len(reruns) else None,
+        'reruns_por_s': round(total / duracion, 2) if duracion else None,
+        'kb_por_rerun': round(float(np.mean(recibidos)) / 1024, 1) if recibidos else None,
+        'rss_pico_mb': round(max(memoria), 1) if memoria else None,
+        'duracion_s': round(duracion, 3),
+        'fallos': sorted({f for r in resultados for f in r['fallos']})[:5],
+    }
+
+async def run_levels(url, niveles, acciones, timeout, pid):
+    # Calentar las cachés compartidas: el primer visitante paga la carga de datos
+    await run_session(url, 0, 0, timeout)
+    resultados = []
+    for sesiones in niveles:
+        resultado = await run_level(url, sesiones, acciones, timeout, pid)
+        resultados.append(resultado)
+        print(json.dumps(resultado, ensure_ascii=False), flush=True)
+    return resultados
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga del dashboard FNA con sesiones concurrentes")
+    parser.add_argument('--sesiones', nargs='+', type=int, default=list(SESIONES_POR_DEFECTO),
+                        help="Niveles de sesiones concurrentes")
+    parser.add_argument('--acciones', type=int, default=20, help="Acciones del sidebar por sesión")
+    parser.add_argument('--app', default=os.path.join(RAIZ, 'app.py'))
+    parser.add_argument('--url', default=None, help="Websocket de un servidor ya corriendo (…/_stcore/stream)")
+    parser.add_argument('--pid', type=int, default=None, help="PID del servidor indicado con --url, para medir su memoria")
+    parser.add_argument('--timeout', type=float, default=120, help="Segundos máximos por rerun")
+    parser.add_argument('--salida', default=None, help="Guardar los resultados en un archivo JSON")
+    args = parser.parse_args(argv)
+
+    servidor = None
+    url, pid = args.url, args.pid
+    if url is None:
+        puerto = free_port()
+        servidor = start_server(args.app, puerto)
+        url, pid = f'ws://127.0.0.1:{puerto}/_stcore/stream', servidor.pid
+
+    try:
+        resultados = asyncio.run(run_levels(url, args.sesiones, args.acciones, args.timeout, pid))
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""Benchmarks del procesamiento y del renderizado del dashboard según el tamaño de los datos.
+
+Mide el tiempo (mediana de varias repeticiones) y el pico de memoria asignada
+(tracemalloc: memoria de Python y NumPy, no la interna de GEOS) de cada etapa:
+procesamiento de las fuentes, carga del artefacto, filtros, mapas, gráficos y
+estilos de la tabla. Corre sobre los datos incluidos y sobre datos sintéticos:
+oficinas replicadas N veces alrededor de su ubicación y departamentos divididos
+en una rejilla para simular polígonos de nivel municipal.
+
+Uso (desde la raíz del repositorio, con los datos en data/):
+    python benchmarks/suite.py
+    python benchmarks/suite.py --escalas 1 10 100 1000 10000 --casos procesar cargar
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import geopandas as gpd
+import shapely
+
+import office_index
+import pipeline
+import visuals
+
+ESCALAS_POR_DEFECTO = (1, 10, 100, 1000)
+
+# Lado en grados de la rejilla que divide los departamentos en "municipios" sintéticos
+PASO_MUNICIPIOS = 0.3
+
+def measure(funcion, repeticiones):
+    """Mediana y mínimo del tiempo de ejecución y pico de memoria asignada"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'mediana_s': round(statistics.median(tiempos), 4),
+        'min_s': round(min(tiempos), 4),
+        'pico_mb': round(pico / 2 ** 20, 2),
+    }
+
+def synthetic_offices(df, factor, semilla=0):
+    """Replicar cada oficina `factor` veces con un desplazamiento de unos kilómetros"""
+    rng = np.random.default_rng(semilla)
+    sinteticas = df.loc[df.index.repeat(factor)].reset_index(drop=True)
+    # El ruido conserva el signo publicado para que la corrección de signo siga aplicando
+    for columna in ('Latitud', 'Longitud'):
+        valores = sinteticas[columna].to_numpy(dtype=float)
+        sinteticas[columna] = valores + np.sign(valores) * rng.normal(0, 0.03, len(valores))
+    sinteticas['direccion'] = sinteticas['direccion'].astype(str) + ' #' + sinteticas.index.astype(str)
+    return sinteticas
+
+def synthetic_municipalities(data_unida, paso=PASO_MUNICIPIOS, semilla=0):
+    """Dividir cada departamento con una rejilla regular para obtener polígonos de nivel municipal"""
+    rng = np.random.default_rng(semilla)
+    departamentos = data_unida.set_geometry('geometry').to_crs(4326)
+    minx, miny, maxx, maxy = departamentos.total_bounds
+    x, y = np.meshgrid(np.arange(minx, maxx, paso), np.arange(miny, maxy, paso))
+    celdas = shapely.box(x.ravel(), y.ravel(), x.ravel() + paso, y.ravel() + paso)
+
+    idx_departamentos, idx_celdas = shapely.STRtree(celdas).query(departamentos.geometry.values, predicate='intersects')
+    partes = shapely.intersection(departamentos.geometry.values[idx_departamentos], celdas[idx_celdas])
+    validas = ~shapely.is_empty(partes) & (shapely.area(partes) > 0)
+
+    municipios = gpd.GeoDataFrame({
+        'DPTO_CNMBR': [f'MUNICIPIO {i}' for i in range(validas.sum())],
+        'DPTO_CCDGO': departamentos['DPTO_CCDGO'].to_numpy()[idx_departamentos[validas]],
+        'cantidad_oficinas': rng.integers(0, 6, validas.sum()),
+    }, geometry=partes[validas], crs='EPSG:4326')
+    municipios['DPTO_CNMBR_NORM'] = municipios['DPTO_CNMBR']
+    return municipios
+
+def source_cases(shapefile_path, csv_path, escala, directorio):
+    """Procesamiento de las fuentes y carga del artefacto con `escala` veces las oficinas"""
+    ruta_csv = csv_path
+    if escala > 1:
+        ruta_csv = os.path.join(directorio, f'oficinas_x{escala}.csv')
+        synthetic_offices(pipeline.read_offices(csv_path), escala).to_csv(ruta_csv, index=False)
+    build_dir = os.path.join(directorio, f'build_x{escala}')
+    pipeline.build_artifact(shapefile_path, ruta_csv, build_dir)
+
+    return {
+        'procesar': lambda: pipeline.process_sources(shapefile_path, ruta_csv),
+        'cargar': lambda: pipeline.load_artifact(shapefile_path, ruta_csv, build_dir),
+    }
+
+def office_filter(indice):
+    """Filtro de atributos de ejemplo: la mitad de los valores de cada atributo"""
+    return tuple(
+        (columna, tuple(atributo['valores'][:max(1, len(atributo['valores']) // 2)]))
+        for columna, atributo in indice['atributos'].items()
+    )
+
+def rendering_cases(data, nivel, df):
+    """Filtros, mapas, gráficos y estilos de tabla sobre una capa de polígonos"""
+    maximo = int(data['cantidad_oficinas'].max())
+    regiones = list(data['DPTO_CNMBR_NORM'].iloc[::3])
+    tabla = data[['DPTO_CNMBR', 'cantidad_oficinas']]
+
+    # Índice de las oficinas sobre los polígonos de esta capa, como lo guarda la app una vez por artefacto
+    ubicacion = pipeline.assign_offices_to_departments(
+        df['latitud_corregida'], df['longitud_corregida'], data.geometry.values
+    )
+    capa = pipeline.add_density_metrics(data[['DPTO_CNMBR_NORM', 'cantidad_oficinas', 'geometry']].assign(
+        DPTO_CCDGO=np.arange(len(data))
+    ))
+    indice = office_index.build_office_index(df.assign(DPTO_CCDGO=ubicacion['departamento'].to_numpy()), capa)
+    poblacion = capa.set_index('DPTO_CCDGO')['poblacion']
+    filtro = office_filter(indice)
+
+    def filter_offices():
+        # Mismo camino que la app: filtered_office_data (bitmaps y bincount) y luego filter_mask
+        filtrados = capa.copy(deep=False)
+        filtrados['cantidad_oficinas'] = office_index.department_counts(indice, office_index.office_mask(indice, filtro))
+        filtrados = pipeline.add_density_metrics(filtrados, poblacion)
+        return visuals.filter_mask(filtrados, (2, maximo), regiones)
+
+    def render_map(map_type):
+        mapa = visuals.create_folium_map(data, visuals.filter_data(data, (2, maximo), []), map_type)
+        return mapa.get_root().render()
+
+    casos = {
+        'filtrar': lambda: visuals.filter_mask(capa, (2, maximo), regiones),
+        'filtrar_oficinas': filter_offices,
+        'mapa_thematic': lambda: render_map('thematic'),
+        'mapa_blues': lambda: render_map('blues'),
+        'grafico_top7': lambda: visuals.create_top_departments_chart(data).to_json(),
+        'grafico_distribucion': lambda: visuals.create_distribution_chart(data).to_json(),
+        'estilo_tabla': lambda: tabla.style.apply(visuals.style_dataframe, axis=None).to_html(),
+    }
+    if nivel == 'municipios':
+        casos['niveles_detalle'] = lambda: pipeline.build_detail_levels(data.copy())
+    return casos
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del dashboard FNA según el tamaño de los datos")
+    parser.add_argument('--escalas', nargs='+', type=int, default=list(ESCALAS_POR_DEFECTO),
+                        help="Factores de réplica de las oficinas")
+    parser.add_argument('--casos', nargs='*', default=None, help="Ejecutar solo estos casos")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--shapefile', default=pipeline.SHAPEFILE_PATH)
+    parser.add_argument('--csv', default=pipeline.CSV_PATH)
+    parser.add_argument('--salida', default=None, help="Guardar los resultados en un archivo JSON")
+    args = parser.parse_args(argv)
+
+    resultados = []
+
+    def run(caso, nivel, filas, funcion):
+        if args.casos and caso not in args.casos:
+            return
+        resultado = {'caso': caso, 'nivel': nivel, 'filas': filas, **measure(funcion, args.repeticiones)}
+        resultados.append(resultado)
+        print(json.dumps(resultado, ensure_ascii=False), flush=True)
+
+    casos_fuentes = {'procesar', 'cargar'}
+    with tempfile.TemporaryDirectory() as directorio:
+        oficinas = len(pipeline.read_offices(args.csv))
+        for escala in (args.escalas if not args.casos or casos_fuentes & set(args.casos) else []):
+            for caso, funcion in source_cases(args.shapefile, args.csv, escala, directorio).items():
+                run(caso, 'oficinas', oficinas * escala, funcion)
+
+    data_unida, df, _ = pipeline.process_sources(args.shapefile, args.csv)
+    municipios = pipeline.build_detail_levels(synthetic_municipalities(data_unida))
+    for nivel, data in (('departamentos', data_unida), ('municipios', municipios)):
+        for caso, funcion in rendering_cases(data, nivel, df).items():
+            run(caso, nivel, len(data), funcion)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
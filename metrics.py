@@ -0,0 +1,142 @@
+"""Instrumentación por etapa del dashboard FNA: tiempo, bytes enviados y memoria asignada.
+
+El tiempo de cada etapa se registra siempre (solo cuesta un perf_counter). Los
+bytes de las cargas útiles y la memoria asignada se calculan en modo detallado,
+que se activa para todo el proceso con FNA_METRICAS=1 (el panel de depuración,
+?debug=1, solo muestra las métricas); en ese modo cada etapa también se escribe
+como una línea JSON en el log `fna.metricas`. La memoria de una etapa es el pico
+de todo el proceso mientras dura: tracemalloc no distingue hilos ni sesiones.
+Con FNA_METRICAS_PUERTO se sirven las métricas en formato de texto de
+Prometheus en http://127.0.0.1:<puerto>/metrics.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger('fna.metricas')
+
+HOST_METRICAS = "127.0.0.1"
+PUERTO_METRICAS = os.environ.get("FNA_METRICAS_PUERTO")
+
+_detallado = False
+_lock = threading.Lock()
+_etapas = {}
+_local = threading.local()
+
+def detailed():
+    """Si se calculan bytes y memoria además del tiempo"""
+    return _detallado
+
+def enable_detailed():
+    """Activar bytes, memoria y logs estructurados para todo el proceso"""
+    global _detallado
+    if _detallado:
+        return
+    _detallado = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+def payload_size(valor):
+    """Tamaño en bytes de una carga útil (texto, bytes o estructura JSON)"""
+    if isinstance(valor, bytes):
+        return len(valor)
+    if not isinstance(valor, str):
+        valor = json.dumps(valor, default=str)
+    return len(valor.encode('utf-8'))
+
+@contextmanager
+def stage(nombre):
+    """Medir una etapa; el registro admite la clave 'bytes' para la carga útil producida"""
+    registro = {}
+    memoria = _detallado and tracemalloc.is_tracing()
+    pila = _local.__dict__.setdefault('picos', [])
+    if memoria:
+        actual, pico = tracemalloc.get_traced_memory()
+        if pila:
+            pila[-1] = max(pila[-1], pico)
+        tracemalloc.reset_peak()
+        pila.append(0)
+        memoria_inicial = actual
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro['segundos'] = time.perf_counter() - inicio
+        if memoria:
+            # El pico de una etapa incluye el de sus sub-etapas (reset_peak es global)
+            _, pico = tracemalloc.get_traced_memory()
+            pico = max(pico, pila.pop())
+            if pila:
+                pila[-1] = max(pila[-1], pico)
+            registro['asignado_bytes'] = max(pico - memoria_inicial, 0)
+        record(nombre, registro)
+
+def record(nombre, registro):
+    """Acumular una medición de la etapa"""
+    with _lock:
+        etapa = _etapas.setdefault(nombre, {'llamadas': 0, 'segundos_total': 0.0, 'bytes_total': 0})
+        etapa['llamadas'] += 1
+        etapa['segundos_total'] += registro['segundos']
+        etapa['bytes_total'] += registro.get('bytes', 0)
+        etapa['ultima'] = dict(registro)
+    if _detallado:
+        logger.info(json.dumps({'etapa': nombre, **registro}))
+
+def snapshot():
+    """Copia de las métricas acumuladas por etapa"""
+    with _lock:
+        return {nombre: {**etapa, 'ultima': dict(etapa['ultima'])} for nombre, etapa in _etapas.items()}
+
+def prometheus_text():
+    """Métricas acumuladas en el formato de texto de Prometheus"""
+    etapas = snapshot()
+    series = [
+        ('fna_etapa_llamadas_total', 'counter', "Ejecuciones de la etapa", lambda e: e['llamadas']),
+        ('fna_etapa_segundos_total', 'counter', "Tiempo acumulado de la etapa", lambda e: e['segundos_total']),
+        ('fna_etapa_bytes_total', 'counter', "Bytes acumulados de la carga útil de la etapa", lambda e: e['bytes_total']),
+        ('fna_etapa_ultima_segundos', 'gauge', "Duración de la última ejecución", lambda e: e['ultima']['segundos']),
+        ('fna_etapa_ultima_asignado_bytes', 'gauge', "Pico de memoria del proceso durante la última ejecución",
+         lambda e: e['ultima'].get('asignado_bytes')),
+    ]
+    lineas = []
+    for nombre, tipo, ayuda, valor in series:
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+        for etapa, datos in sorted(etapas.items()):
+            if valor(datos) is not None:
+                lineas.append(f'{nombre}{{etapa="{etapa}"}} {valor(datos)}')
+    return '\n'.join(lineas) + '\n'
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        contenido = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(contenido)))
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(host=HOST_METRICAS, port=PUERTO_METRICAS):
+    """Servir /metrics en un hilo de fondo y devolver su URL"""
+    servidor = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f"http://{host}:{servidor.server_address[1]}/metrics"
+
+if os.environ.get("FNA_METRICAS") == "1":
+    enable_detailed()
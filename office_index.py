@@ -0,0 +1,98 @@
+"""Índices de bitmaps sobre los atributos de las oficinas para filtrar y recontar por departamento.
+
+Cada valor de un atributo (estado, tipo de entidad, categoría, ...) guarda un
+bitmap empaquetado con un bit por oficina. Una combinación de filtros es un OR
+de los bitmaps de los valores elegidos de cada atributo y un AND entre
+atributos; los conteos por departamento salen de un solo bincount sobre la
+posición del departamento de las oficinas seleccionadas. Nada de esto vuelve a
+agrupar el DataFrame de oficinas ni a unirlo con la capa de departamentos.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# Atributos de las oficinas que se pueden filtrar desde el sidebar: columna -> etiqueta
+ATRIBUTOS_OFICINA = {
+    'entidad': 'Entidad',
+    'estado': 'Estado',
+    'tipodeentidad': 'Tipo de Entidad',
+    'cat': 'Categoría',
+    'atiende_sabados': 'Atiende Sábados',
+}
+
+# El horario es texto libre: se resume en si la oficina abre los sábados
+COLUMNA_HORARIO = 'horario actual /contingencia'
+SIN_DATO = 'Sin dato'
+
+# Con más valores distintos que esto un atributo guarda el código de cada oficina
+# en lugar de un bitmap por valor (la memoria crecería con valores x oficinas)
+MAX_VALORES_BITMAP = 64
+
+def _normalize_value(columna, valor):
+    """Valor de un atributo con espacios colapsados; vacíos como 'Sin dato'"""
+    if pd.isna(valor) or not str(valor).strip():
+        return SIN_DATO
+    if columna == 'atiende_sabados':
+        return 'Sí' if re.search(r'S[AÁ]BADO', str(valor), re.IGNORECASE) else 'No'
+    return ' '.join(str(valor).split())
+
+def office_attributes(df):
+    """Código de cada oficina y valores de cada atributo, normalizando solo los valores distintos"""
+    atributos = {}
+    for columna in ATRIBUTOS_OFICINA:
+        origen = COLUMNA_HORARIO if columna == 'atiende_sabados' else columna
+        if origen not in df.columns:
+            continue
+        codigos, unicos = pd.factorize(df[origen], use_na_sentinel=False)
+        codigos_valor, valores = pd.factorize(pd.Series([_normalize_value(columna, v) for v in unicos], dtype=object), sort=True)
+        atributos[columna] = (codigos_valor[codigos], valores.tolist())
+    return atributos
+
+def build_office_index(df, data):
+    """Bitmaps por valor de cada atributo y posición en `data` del departamento de cada oficina"""
+    posiciones = pd.Series(np.arange(len(data)), index=data['DPTO_CCDGO'].to_numpy())
+    departamento = df['DPTO_CCDGO'].map(posiciones).fillna(-1).to_numpy(dtype=np.int64)
+
+    atributos = {}
+    for columna, (codigos, valores) in office_attributes(df).items():
+        if len(valores) < 2:
+            # Un solo valor no filtra nada
+            continue
+        atributo = {'valores': valores}
+        if len(valores) <= MAX_VALORES_BITMAP:
+            atributo['bitmaps'] = {valor: np.packbits(codigos == i) for i, valor in enumerate(valores)}
+        else:
+            atributo['codigos'] = codigos.astype(np.int32)
+        atributos[columna] = atributo
+
+    return {
+        'oficinas': len(df),
+        'departamentos': len(data),
+        'departamento': departamento,
+        'atributos': atributos,
+    }
+
+def selection_bitmap(indice, filtros):
+    """Bitmap de las oficinas que cumplen los filtros: OR entre valores de un atributo, AND entre atributos"""
+    seleccion = np.full(-(-indice['oficinas'] // 8), 0xFF, dtype=np.uint8)
+    for columna, valores in filtros:
+        atributo = indice['atributos'][columna]
+        if 'bitmaps' in atributo:
+            union = np.zeros_like(seleccion)
+            for valor in valores:
+                union |= atributo['bitmaps'][valor]
+        else:
+            elegidos = np.isin(atributo['valores'], list(valores))
+            union = np.packbits(elegidos[atributo['codigos']])
+        seleccion &= union
+    return seleccion
+
+def office_mask(indice, filtros):
+    """Máscara booleana de las oficinas que cumplen los filtros"""
+    return np.unpackbits(selection_bitmap(indice, filtros), count=indice['oficinas']).view(bool)
+
+def department_counts(indice, mascara):
+    """Oficinas seleccionadas por departamento, en el orden de la capa de departamentos"""
+    departamento = indice['departamento'][mascara]
+    return np.bincount(departamento[departamento >= 0], minlength=indice['departamentos'])
@@ -0,0 +1,629 @@
+"""Procesamiento de datos del dashboard FNA, independiente de Streamlit.
+
+Uso:
+    python pipeline.py build      Compilar shapefile + CSV en el artefacto de data/build/
+    python pipeline.py validar    Reportar oficinas con coordenadas corregidas o inconsistentes
+    python pipeline.py actualizar CSV    Copiar un nuevo snapshot de oficinas a data/ y aplicarlo al artefacto existente
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pyarrow as pa
+import shapely
+
+from metrics import stage
+from registries import (
+    ENTIDAD_PRINCIPAL, declared_departments, latest_snapshot, read_registries,
+    read_registry, registry_snapshots, store_snapshot,
+)
+
+# Rutas de los datos de entrada
+SHAPEFILE_PATH = "data/MGN2021_DPTO_POLITICO/MGN_DPTO_POLITICO.shp"
+MPIO_SHAPEFILE_PATH = "data/MGN2021_MPIO_POLITICO/MGN_MPIO_POLITICO.shp"
+# Proyecciones de población del DANE por departamento: columnas DPTO_CCDGO, poblacion y, opcional, año
+POBLACION_PATH = "data/DANE_poblacion_departamentos.csv"
+
+CSV_PATH = latest_snapshot() or "data/Oficinas_Fondo_Nacional_del_Ahorro_20250906.csv"
+
+# Artefacto compilado (Arrow IPC sin comprimir, geometrías en WKB)
+BUILD_DIR = "data/build"
+ARTIFACT_DEPARTAMENTOS = os.path.join(BUILD_DIR, "departamentos.arrow")
+ARTIFACT_OFICINAS = os.path.join(BUILD_DIR, "oficinas.arrow")
+ARTIFACT_HECHOS = os.path.join(BUILD_DIR, "hechos.arrow")
+
+# Incrementar al cambiar el procesamiento o el esquema: invalida los artefactos ya compilados
+VERSION_ARTEFACTO = 6
+
+# Niveles de zoom para los que se precalcula una geometría simplificada
+NIVELES_ZOOM = (5, 7, 9)
+
+def layer_paths(shapefile_path=SHAPEFILE_PATH, mpio_shapefile_path=MPIO_SHAPEFILE_PATH, population_path=POBLACION_PATH):
+    """Archivos de entrada que no son CSV de oficinas: componentes de los shapefiles y tabla de población"""
+    componentes = []
+    for shapefile in (shapefile_path, mpio_shapefile_path):
+        if shapefile:
+            base = os.path.splitext(shapefile)[0]
+            componentes += [base + ext for ext in ('.shp', '.shx', '.dbf', '.prj', '.cpg')]
+    componentes.append(population_path)
+    return [ruta for ruta in componentes if ruta and os.path.exists(ruta)]
+
+def source_paths(shapefile_path=SHAPEFILE_PATH, csv_path=CSV_PATH, mpio_shapefile_path=MPIO_SHAPEFILE_PATH,
+                 population_path=POBLACION_PATH):
+    """Archivos de entrada: capas y población, más el CSV de oficinas de cada entidad"""
+    return layer_paths(shapefile_path, mpio_shapefile_path, population_path) + list(registry_snapshots(csv_path).values())
+
+def source_hash(paths):
+    """Hash SHA-256 del contenido de los archivos de entrada"""
+    h = hashlib.sha256()
+    for ruta in paths:
+        h.update(os.path.basename(ruta).encode('utf-8'))
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloque)
+    return h.hexdigest()
+
+def zoom_tolerance(zoom):
+    """Tolerancia de simplificación (grados) equivalente a medio píxel en el zoom dado"""
+    return 180 / (256 * 2 ** zoom)
+
+# Rejilla a la que se ajustan los vértices antes de extraer los arcos, como fracción de la tolerancia:
+# fronteras compartidas cuyos vértices difieren en ~1e-9° quedan idénticas
+FRACCION_REJILLA = 1e-3
+
+def _valid(geoms):
+    """Geometrías válidas para operaciones de superposición (el shapefile puede traer anillos inválidos)"""
+    return np.where(shapely.is_valid(geoms), geoms, shapely.make_valid(geoms))
+
+def within_simplification_error(simplificadas, originales, tolerance):
+    """Polígonos simplificados cuyo cambio de área y de cobertura cabe en la tolerancia
+
+    La simplificación desplaza cada borde a lo sumo `tolerance`: el área ganada fuera
+    del original o perdida de él no puede superar perímetro x tolerancia. Un polígono
+    que se quedó con caras de sus vecinos (o las perdió) lo supera por mucho.
+    """
+    simplificadas, originales = _valid(simplificadas), _valid(originales)
+    interseccion = shapely.area(shapely.intersection(simplificadas, originales))
+    maximo = shapely.length(originales) * tolerance
+    sobrante = shapely.area(simplificadas) - interseccion
+    faltante = shapely.area(originales) - interseccion
+    return (sobrante <= maximo) & (faltante <= maximo)
+
+def simplify_preserving_topology(geometries, tolerance):
+    """Simplificar polígonos vecinos conservando sus fronteras compartidas
+
+    Los vértices se ajustan a una rejilla y los bordes se nodan antes de extraer los
+    arcos; los arcos simplificados se vuelven a nodar antes de reconstruir las caras.
+    Un polígono cuyo resultado se sale de la tolerancia conserva su geometría original.
+    """
+    geoms = np.asarray(geometries, dtype=object)
+    rejilla = tolerance * FRACCION_REJILLA
+
+    # Descomponer los bordes en arcos entre nodos: cada frontera compartida es un solo arco
+    bordes = shapely.union_all(shapely.boundary(shapely.set_precision(_valid(geoms), rejilla)), grid_size=rejilla)
+    arcos = shapely.get_parts(shapely.line_merge(bordes))
+    arcos = shapely.simplify(arcos, tolerance, preserve_topology=True)
+
+    # Arcos simplificados por separado pueden cruzarse: nodarlos y reconstruir las caras
+    caras = shapely.get_parts(shapely.polygonize(shapely.get_parts(shapely.union_all(arcos))))
+
+    # Asignar cada cara al polígono original que contiene su punto interior;
+    # las caras de huecos entre polígonos no pertenecen a ninguno y se descartan
+    asignacion = np.full(len(caras), -1)
+    if len(caras):
+        idx_caras, idx_geoms = shapely.STRtree(geoms).query(shapely.point_on_surface(caras), predicate='intersects')
+        asignacion[idx_caras[::-1]] = idx_geoms[::-1]
+
+    simplificadas = np.empty(len(geoms), dtype=object)
+    for i, original in enumerate(geoms):
+        partes = caras[asignacion == i]
+        if len(partes) == 0:
+            # Polígonos muy pequeños (islas) que colapsan: simplificación individual
+            simplificadas[i] = shapely.simplify(original, tolerance, preserve_topology=True)
+        else:
+            simplificadas[i] = shapely.union_all(partes)
+
+    # Respaldo por polígono: la geometría original si la simplificación no es confiable
+    return np.where(within_simplification_error(simplificadas, geoms, tolerance), simplificadas, geoms)
+
+def build_detail_levels(data):
+    """Añadir una columna de geometría simplificada por cada nivel de zoom"""
+    for zoom in NIVELES_ZOOM:
+        data[f'geometry_z{zoom}'] = gpd.GeoSeries(
+            simplify_preserving_topology(data.geometry.values, zoom_tolerance(zoom)),
+            index=data.index,
+            crs=data.crs
+        )
+    return data
+
+# Agrupación de oficinas en celdas de la rejilla de píxeles, por nivel de zoom.
+# En el último nivel la celda es de 1 px: prácticamente puntos individuales.
+NIVELES_CLUSTER = tuple(range(4, 14))
+TAMANO_CELDA_PX = 60
+
+def web_mercator(latitudes, longitudes):
+    """Coordenadas Web Mercator normalizadas a [0, 1] (origen en la esquina noroeste)"""
+    lat = np.clip(np.asarray(latitudes, dtype=float), -85.0511, 85.0511)
+    x = (np.asarray(longitudes, dtype=float) + 180) / 360
+    y = 0.5 - np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)) / (2 * np.pi)
+    return x, y
+
+def build_point_clusters(latitudes, longitudes, niveles=NIVELES_CLUSTER, cell_px=TAMANO_CELDA_PX):
+    """Agrupar puntos en una rejilla de píxeles para cada nivel de zoom"""
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+    validos = np.isfinite(lat) & np.isfinite(lon)
+    lat, lon = lat[validos], lon[validos]
+    x, y = web_mercator(lat, lon)
+
+    niveles_cluster = []
+    for zoom in niveles:
+        celda = 1 if zoom == niveles[-1] else cell_px
+        escala = 256 * 2 ** zoom / celda
+        clave = np.floor(x * escala).astype(np.int64) * (int(escala) + 1) + np.floor(y * escala).astype(np.int64)
+        _, grupo, cantidad = np.unique(clave, return_inverse=True, return_counts=True)
+        niveles_cluster.append(pd.DataFrame({
+            'zoom': zoom,
+            'latitud': np.bincount(grupo, weights=lat) / cantidad,
+            'longitud': np.bincount(grupo, weights=lon) / cantidad,
+            'cantidad': cantidad,
+        }))
+
+    if not niveles_cluster:
+        return pd.DataFrame(columns=['zoom', 'latitud', 'longitud', 'cantidad'])
+    return pd.concat(niveles_cluster, ignore_index=True)
+
+# Variantes de signo (latitud, longitud) en orden de preferencia
+CORRECCIONES_SIGNO = {
+    'ninguna': (1, 1),
+    'longitud': (1, -1),
+    'latitud': (-1, 1),
+    'ambas': (-1, -1),
+}
+
+def assign_offices_to_departments(latitudes, longitudes, geometries, declared=None, groups=None):
+    """Asignar oficinas a polígonos por punto-en-polígono, detectando errores de signo
+
+    Se prueban las cuatro variantes de signo de cada coordenada en una sola consulta
+    STRtree. Los polígonos son los departamentos o, con `groups` (posición del
+    departamento de cada polígono), unidades más finas como los municipios. Si se
+    conoce el departamento declarado (posición, -1 si no), se prefiere la variante
+    que cae en él; si ninguna lo hace, se conserva el declarado sin polígono y la
+    fila se marca como conflicto.
+    """
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+    n = len(lat)
+    geoms = np.asarray(geometries, dtype=object)
+    declarado = np.full(n, -1) if declared is None else np.asarray(declared, dtype=int)
+    grupos = np.arange(len(geoms)) if groups is None else np.asarray(groups, dtype=int)
+
+    signos = np.array(list(CORRECCIONES_SIGNO.values()))
+    puntos = shapely.points(lon[None, :] * signos[:, 1:2], lat[None, :] * signos[:, 0:1]).ravel()
+
+    # Árbol sobre los puntos y polígonos preparados como consulta: escala con millones de puntos
+    idx_poligonos, idx_puntos = shapely.STRtree(puntos).query(geoms, predicate='intersects')
+    candidato = np.full(len(puntos), -1)
+    candidato[idx_puntos[::-1]] = idx_poligonos[::-1]
+    candidato = candidato.reshape(len(signos), n)
+
+    dentro = candidato >= 0
+    grupo = np.where(dentro, grupos[candidato], -1)
+    coincide = (grupo == declarado[None, :]) & (declarado >= 0)
+    variante = np.where(coincide.any(axis=0), coincide.argmax(axis=0), dentro.argmax(axis=0))
+    columnas = np.arange(n)
+
+    fuera = ~dentro.any(axis=0)
+    conflicto = (declarado >= 0) & ~coincide.any(axis=0)
+    variante = np.where(fuera, 0, variante)
+
+    return pd.DataFrame({
+        'poligono': np.where(conflicto, -1, candidato[variante, columnas]),
+        'departamento': np.where(conflicto, declarado, grupo[variante, columnas]),
+        'latitud_corregida': lat * signos[variante, 0],
+        'longitud_corregida': lon * signos[variante, 1],
+        'correccion_coordenadas': np.array(list(CORRECCIONES_SIGNO))[variante],
+        'fuera_de_poligonos': fuera,
+        'conflicto_departamento': conflicto & ~fuera,
+    })
+
+# Jerarquía territorial, de la unidad más fina a la más agregada: nivel -> columna de la oficina
+NIVELES_JERARQUIA = {
+    'municipio': 'MPIO_CCNCT',
+    'departamento': 'DPTO_CCDGO',
+    'regional': 'Regional',
+}
+
+def build_office_facts(df):
+    """Tabla de hechos: oficinas contadas una sola vez por municipio, departamento, regional y entidad"""
+    claves = pd.DataFrame({
+        nivel: df[columna] if columna in df.columns else pd.Series(None, index=df.index, dtype=object)
+        for nivel, columna in {**NIVELES_JERARQUIA, 'entidad': 'entidad'}.items()
+    })
+    claves['regional'] = claves['regional'].str.split().str.join(' ')
+    return claves.value_counts(dropna=False).rename('cantidad_oficinas').reset_index()
+
+def rollup(hechos, *niveles):
+    """Totales por uno o más niveles sumando la tabla de hechos, sin repetir la unión espacial"""
+    return hechos.groupby(list(niveles))['cantidad_oficinas'].sum()
+
+def update_office_facts(hechos, agregadas, retiradas):
+    """Tabla de hechos con las oficinas agregadas sumadas y las retiradas restadas"""
+    dimensiones = [c for c in hechos.columns if c != 'cantidad_oficinas']
+    retiradas = build_office_facts(retiradas)
+    retiradas['cantidad_oficinas'] *= -1
+    hechos = pd.concat([hechos, build_office_facts(agregadas), retiradas], ignore_index=True)
+    hechos = hechos.groupby(dimensiones, dropna=False)['cantidad_oficinas'].sum().reset_index()
+    return hechos[hechos['cantidad_oficinas'] != 0].reset_index(drop=True)
+
+def count_offices(data, hechos):
+    """Conteo de oficinas de cada departamento de la capa, leído del rollup de la tabla de hechos"""
+    return data['DPTO_CCDGO'].map(rollup(hechos, 'departamento')).fillna(0).astype(int)
+
+# Columnas calculadas al ubicar cada oficina; se reutilizan si la oficina no cambia entre snapshots
+COLUMNAS_UBICACION = [
+    'latitud_corregida', 'longitud_corregida', 'correccion_coordenadas',
+    'fuera_de_poligonos', 'conflicto_departamento', 'DPTO_CCDGO', 'MPIO_CCNCT',
+]
+
+def read_offices(csv_path=CSV_PATH):
+    """Leer un snapshot del CSV de oficinas de la entidad principal"""
+    return read_registry(ENTIDAD_PRINCIPAL, csv_path)
+
+def locate_offices(df, data, municipios=None):
+    """Agregar a las oficinas su ubicación corregida, departamento y municipio
+
+    Con la capa municipal del MGN se hace una sola unión espacial contra los
+    municipios y el departamento se toma del municipio; sin ella, contra los
+    departamentos.
+    """
+    # Departamento declarado: solo para elegir la corrección de signo y validar
+    declarado = declared_departments(df, data['DPTO_CNMBR'])
+
+    if municipios is None:
+        poligonos, grupos = data.geometry.values, None
+    else:
+        posiciones = pd.Series(np.arange(len(data)), index=data['DPTO_CCDGO'].to_numpy())
+        poligonos = municipios.geometry.values
+        grupos = municipios['DPTO_CCDGO'].map(posiciones).fillna(-1).to_numpy(dtype=int)
+
+    # Unión espacial punto-en-polígono sobre todas las oficinas a la vez
+    asignacion = assign_offices_to_departments(df['Latitud'], df['Longitud'], poligonos, declarado, grupos)
+    df = pd.concat([df, asignacion.drop(columns=['poligono', 'departamento']).set_axis(df.index)], axis=1)
+    df['DPTO_CCDGO'] = data['DPTO_CCDGO'].reindex(asignacion['departamento']).to_numpy()
+
+    df['MPIO_CCNCT'] = None
+    if municipios is not None:
+        poligono = asignacion['poligono'].to_numpy()
+        codigos = municipios['MPIO_CCNCT'].to_numpy(dtype=object)
+        df['MPIO_CCNCT'] = np.where(poligono >= 0, codigos[poligono], None)
+    return df
+
+def read_municipalities(mpio_shapefile_path=MPIO_SHAPEFILE_PATH):
+    """Capa municipal del MGN; None si no está disponible"""
+    if mpio_shapefile_path and os.path.exists(mpio_shapefile_path):
+        return gpd.read_file(mpio_shapefile_path, encoding='utf-8')
+    return None
+
+# Lambert azimutal de áreas iguales centrada en Colombia, para medir superficies
+PROYECCION_AREA = "+proj=laea +lat_0=4 +lon_0=-73 +datum=WGS84 +units=m +no_defs"
+
+# Métricas por departamento que pueden colorear el mapa y los gráficos: columna -> etiqueta
+METRICAS = {
+    'cantidad_oficinas': 'Oficinas',
+    'oficinas_por_100k': 'Oficinas por 100.000 habitantes',
+    'oficinas_por_1000_km2': 'Oficinas por 1.000 km²',
+}
+
+def read_population(population_path=POBLACION_PATH):
+    """Población por código de departamento (año más reciente de la tabla); None si no está disponible"""
+    if not (population_path and os.path.exists(population_path)):
+        return None
+    tabla = pd.read_csv(population_path, dtype={'DPTO_CCDGO': str})
+    if 'año' in tabla.columns:
+        tabla = tabla[tabla['año'] == tabla['año'].max()]
+    return tabla.set_index(tabla['DPTO_CCDGO'].str.zfill(2))['poblacion'].astype(float)
+
+def equal_area_km2(data):
+    """Superficie de cada polígono en km², medida en una proyección de áreas iguales"""
+    return data.geometry.to_crs(PROYECCION_AREA).area.to_numpy() / 1e6
+
+def add_density_metrics(data, poblacion=None):
+    """Unir población y superficie por DPTO_CCDGO y calcular oficinas por habitante y por km²
+
+    La superficie se calcula una sola vez y viaja en el artefacto; con una nueva
+    tabla de población o nuevos conteos solo se recalculan las divisiones.
+    """
+    if 'area_km2' not in data.columns:
+        data['area_km2'] = equal_area_km2(data)
+    data['poblacion'] = data['DPTO_CCDGO'].map(poblacion).astype(float) if poblacion is not None else np.nan
+
+    cantidades = data['cantidad_oficinas'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        data['oficinas_por_100k'] = cantidades / data['poblacion'].to_numpy() * 1e5
+        data['oficinas_por_1000_km2'] = cantidades / data['area_km2'].to_numpy() * 1e3
+    return data
+
+def process_sources(shapefile_path=SHAPEFILE_PATH, csv_path=CSV_PATH, mpio_shapefile_path=MPIO_SHAPEFILE_PATH):
+    """Leer el shapefile y los CSV de todas las entidades, ubicar cada oficina en su departamento y contar
+
+    Devuelve los departamentos, las oficinas y la tabla de hechos de la que salen los conteos.
+    """
+    with stage('fuentes.leer_shapefile'):
+        data = gpd.read_file(shapefile_path, encoding='utf-8')
+
+    # Cargar datos de oficinas de todas las entidades en un solo lote
+    with stage('fuentes.leer_csv'):
+        df = read_registries(csv_path)
+
+    # Estandarización de caracteres en shapefile
+    caracteres_mal = ['Á', 'É', 'Í', 'Ó', 'Ú']
+    caracteres_bien = ['A', 'E', 'I', 'O', 'U']
+
+    data["DPTO_CNMBR_NORM"] = data["DPTO_CNMBR"].copy()
+    for j in range(len(caracteres_mal)):
+        data["DPTO_CNMBR_NORM"] = data["DPTO_CNMBR_NORM"].str.replace(caracteres_mal[j], caracteres_bien[j])
+
+    with stage('fuentes.ubicar_oficinas'):
+        df = locate_offices(df, data, read_municipalities(mpio_shapefile_path))
+
+    # Conteo por departamento a partir de la tabla de hechos, que viaja en el artefacto
+    with stage('fuentes.conteo'):
+        hechos = build_office_facts(df)
+        data_unida = data
+        data_unida['cantidad_oficinas'] = count_offices(data_unida, hechos)
+
+    with stage('fuentes.densidad'):
+        data_unida = add_density_metrics(data_unida, read_population())
+
+    # Niveles de detalle precalculados para el mapa
+    with stage('fuentes.niveles_detalle'):
+        data_unida = build_detail_levels(data_unida)
+
+    return data_unida, df, hechos
+
+def coordinate_report(df):
+    """Oficinas con una corrección atípica, fuera de todo polígono o en conflicto con su departamento"""
+    # Un error de signo sistemático (p. ej. longitudes positivas) no se reporta fila por fila
+    predominante = df['correccion_coordenadas'].mode().iloc[0]
+    problemas = (
+        (df['correccion_coordenadas'] != predominante)
+        | df['fuera_de_poligonos']
+        | df['conflicto_departamento']
+    )
+    columnas = ['entidad', 'departamentos', 'tipodeentidad', 'Latitud', 'Longitud', 'DPTO_CCDGO',
+                'correccion_coordenadas', 'fuera_de_poligonos', 'conflicto_departamento']
+    return df.loc[problemas, [c for c in columnas if c in df.columns]]
+
+def _write_table(table, path, metadata):
+    """Escribir una tabla Arrow IPC sin compresión para poder mapearla en memoria"""
+    esquema = {**(table.schema.metadata or {}), **{k.encode(): v.encode() for k, v in metadata.items()}}
+    table = table.replace_schema_metadata(esquema)
+    # Temporal por proceso: varios workers pueden compilar el mismo artefacto a la vez
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+def _read_table(path):
+    """Leer una tabla Arrow IPC mapeada en memoria"""
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+def _write_artifact(data_unida, df, hechos, build_dir, hash_fuentes, hash_capas):
+    """Escribir las tablas de departamentos, oficinas y hechos con el hash de sus fuentes y de sus capas"""
+    os.makedirs(build_dir, exist_ok=True)
+    metadata = {'fuente_sha256': hash_fuentes, 'capas_sha256': hash_capas, 'version': str(VERSION_ARTEFACTO)}
+    _write_table(pa.table(data_unida.to_arrow(geometry_encoding='WKB')),
+                 os.path.join(build_dir, os.path.basename(ARTIFACT_DEPARTAMENTOS)), metadata)
+    _write_table(pa.Table.from_pandas(df, preserve_index=False),
+                 os.path.join(build_dir, os.path.basename(ARTIFACT_OFICINAS)), metadata)
+    # La tabla de hechos se escribe al final: su presencia marca el artefacto completo
+    _write_table(pa.Table.from_pandas(hechos, preserve_index=False),
+                 os.path.join(build_dir, os.path.basename(ARTIFACT_HECHOS)), metadata)
+
+def build_artifact(shapefile_path=SHAPEFILE_PATH, csv_path=CSV_PATH, build_dir=BUILD_DIR):
+    """Compilar las fuentes en el artefacto columnar y devolver su hash de contenido"""
+    hash_fuentes = source_hash(source_paths(shapefile_path, csv_path))
+    data_unida, df, hechos = process_sources(shapefile_path, csv_path)
+    _write_artifact(data_unida, df, hechos, build_dir, hash_fuentes, source_hash(layer_paths(shapefile_path)))
+    return hash_fuentes
+
+def artifact_version(build_dir=BUILD_DIR):
+    """Versión de los datos: snapshot más reciente de cada entidad y marca de modificación del artefacto"""
+    rutas = [os.path.join(build_dir, os.path.basename(ruta)) for ruta in (ARTIFACT_DEPARTAMENTOS, ARTIFACT_OFICINAS, ARTIFACT_HECHOS)]
+    return tuple(registry_snapshots().values()) + tuple(os.stat(ruta).st_mtime_ns for ruta in rutas if os.path.exists(ruta))
+
+def office_keys(df):
+    """Clave de cada oficina para comparar snapshots: entidad, dirección y coordenadas publicadas"""
+    claves = pd.DataFrame({
+        'entidad': df['entidad'] if 'entidad' in df.columns else ENTIDAD_PRINCIPAL,
+        'direccion': df['direccion'].fillna('').str.upper().str.split().str.join(' '),
+        'latitud': pd.to_numeric(df['Latitud'], errors='coerce').round(6),
+        'longitud': pd.to_numeric(df['Longitud'], errors='coerce').round(6),
+    })
+    # Oficinas repetidas con la misma dirección y coordenadas se distinguen por su orden
+    claves['ocurrencia'] = claves.groupby(list(claves.columns), dropna=False).cumcount()
+    return pd.MultiIndex.from_frame(claves)
+
+def refresh_artifact(csv_path, shapefile_path=SHAPEFILE_PATH, build_dir=BUILD_DIR, mpio_shapefile_path=MPIO_SHAPEFILE_PATH):
+    """Aplicar un nuevo snapshot al artefacto, ubicando solo las oficinas nuevas o movidas
+
+    Las oficinas cuya dirección y coordenadas no cambian conservan su ubicación ya
+    calculada; los conteos por departamento se corrigen con la diferencia entre
+    oficinas agregadas y retiradas. Sin artefacto previo, o si cambió alguna fuente
+    que no es un CSV de oficinas (shapefiles, población), se compila completo.
+    """
+    artefacto = load_artifact(shapefile_path, None, build_dir)
+    hash_capas = source_hash(layer_paths(shapefile_path, mpio_shapefile_path))
+    if artefacto is None or artifact_metadata(build_dir).get('capas_sha256') != hash_capas:
+        build_artifact(shapefile_path, csv_path, build_dir)
+        data_unida, df = load_artifact(shapefile_path, csv_path, build_dir)
+        return data_unida, df, {'completo': True, 'oficinas': len(df)}
+
+    data_unida, anterior = artefacto
+    hechos = load_office_facts(build_dir)
+    nuevo = read_registries(csv_path)
+
+    claves_anteriores = office_keys(anterior)
+    posiciones = claves_anteriores.get_indexer(office_keys(nuevo))
+    conservadas = posiciones >= 0
+    retiradas = np.ones(len(anterior), dtype=bool)
+    retiradas[posiciones[conservadas]] = False
+
+    # Ubicar solo las oficinas que no estaban en el snapshot anterior
+    agregadas = locate_offices(nuevo[~conservadas], data_unida, read_municipalities(mpio_shapefile_path))
+    ubicacion = pd.concat([
+        anterior[COLUMNAS_UBICACION].iloc[posiciones[conservadas]].set_axis(np.flatnonzero(conservadas)),
+        agregadas[COLUMNAS_UBICACION].set_axis(np.flatnonzero(~conservadas)),
+    ]).sort_index()
+    df = pd.concat([nuevo, ubicacion], axis=1)
+
+    # Sumar y restar en la tabla de hechos las oficinas que cambiaron; los conteos salen de su rollup
+    hechos = update_office_facts(hechos, agregadas, anterior[retiradas])
+    cantidades = count_offices(data_unida, hechos)
+    afectados = data_unida.loc[cantidades != data_unida['cantidad_oficinas'], 'DPTO_CCDGO']
+    data_unida['cantidad_oficinas'] = cantidades
+    data_unida = add_density_metrics(data_unida, read_population())
+
+    _write_artifact(data_unida, df, hechos, build_dir, source_hash(source_paths(shapefile_path, csv_path, mpio_shapefile_path)),
+                    hash_capas)
+
+    resumen = {
+        'completo': False,
+        'oficinas': len(df),
+        'conservadas': int(conservadas.sum()),
+        'agregadas': int((~conservadas).sum()),
+        'retiradas': int(retiradas.sum()),
+        'departamentos_afectados': sorted(afectados),
+    }
+    return data_unida, df, resumen
+
+def load_artifact(shapefile_path=SHAPEFILE_PATH, csv_path=CSV_PATH, build_dir=BUILD_DIR):
+    """Cargar el artefacto compilado; None si no existe o no corresponde a las fuentes"""
+    ruta_departamentos = os.path.join(build_dir, os.path.basename(ARTIFACT_DEPARTAMENTOS))
+    ruta_oficinas = os.path.join(build_dir, os.path.basename(ARTIFACT_OFICINAS))
+    ruta_hechos = os.path.join(build_dir, os.path.basename(ARTIFACT_HECHOS))
+    if not all(os.path.exists(ruta) for ruta in (ruta_departamentos, ruta_oficinas, ruta_hechos)):
+        return None
+
+    with stage('artefacto.leer'):
+        tabla_departamentos = _read_table(ruta_departamentos)
+        tabla_oficinas = _read_table(ruta_oficinas)
+        with pa.memory_map(ruta_hechos, 'r') as source:
+            metadatos_hechos = pa.ipc.open_file(source).schema.metadata or {}
+
+    # Verificar que el artefacto se compiló con esta versión del procesamiento y a partir de las fuentes actuales
+    metadatos = [tabla.schema.metadata or {} for tabla in (tabla_departamentos, tabla_oficinas)] + [metadatos_hechos]
+    if any(m.get(b'version', b'').decode() != str(VERSION_ARTEFACTO) for m in metadatos):
+        return None
+    hash_artefacto = metadatos[0].get(b'fuente_sha256', b'').decode()
+    if any(m.get(b'fuente_sha256', b'').decode() != hash_artefacto for m in metadatos[1:]):
+        return None
+    if csv_path and os.path.exists(csv_path) and hash_artefacto != source_hash(source_paths(shapefile_path, csv_path)):
+        return None
+
+    data_unida = gpd.GeoDataFrame.from_arrow(tabla_departamentos)
+    df = tabla_oficinas.to_pandas()
+    return data_unida, df
+
+def artifact_metadata(build_dir=BUILD_DIR):
+    """Metadatos del artefacto (hashes de las fuentes y versión), leídos de la tabla de departamentos"""
+    with pa.memory_map(os.path.join(build_dir, os.path.basename(ARTIFACT_DEPARTAMENTOS)), 'r') as source:
+        metadatos = pa.ipc.open_file(source).schema.metadata or {}
+    claves = (b'fuente_sha256', b'capas_sha256', b'version')
+    return {clave.decode(): metadatos[clave].decode() for clave in claves if clave in metadatos}
+
+def load_office_facts(build_dir=BUILD_DIR):
+    """Tabla de hechos del artefacto: oficinas por municipio, departamento, regional y entidad"""
+    return _read_table(os.path.join(build_dir, os.path.basename(ARTIFACT_HECHOS))).to_pandas()
+
+def load_or_build_artifact(shapefile_path=SHAPEFILE_PATH, csv_path=CSV_PATH, build_dir=BUILD_DIR):
+    """Cargar el artefacto o, si falta o está desactualizado, compilarlo y dejarlo en disco
+
+    El primer proceso que encuentra fuentes nuevas paga el procesamiento; los demás
+    workers y los reinicios posteriores leen el artefacto mapeado en memoria.
+    """
+    artefacto = load_artifact(shapefile_path, csv_path, build_dir)
+    if artefacto is not None:
+        return artefacto
+
+    hash_fuentes = source_hash(source_paths(shapefile_path, csv_path))
+    data_unida, df, hechos = process_sources(shapefile_path, csv_path)
+    try:
+        _write_artifact(data_unida, df, hechos, build_dir, hash_fuentes, source_hash(layer_paths(shapefile_path)))
+    except OSError:
+        # Sistema de archivos de solo lectura: se sirven los datos procesados en memoria
+        pass
+    return data_unida, df
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Procesamiento de datos del dashboard FNA")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    build = subparsers.add_parser('build', help="Compilar shapefile + CSV en un artefacto Arrow")
+    build.add_argument('--shapefile', default=SHAPEFILE_PATH)
+    build.add_argument('--csv', default=CSV_PATH)
+    build.add_argument('--salida', default=BUILD_DIR)
+
+    validar = subparsers.add_parser('validar', help="Reportar coordenadas corregidas o inconsistentes")
+    validar.add_argument('--shapefile', default=SHAPEFILE_PATH)
+    validar.add_argument('--csv', default=CSV_PATH)
+
+    actualizar = subparsers.add_parser(
+        'actualizar',
+        help="Aplicar un nuevo snapshot de oficinas al artefacto",
+        description="Copia el CSV a data/ como el snapshot de hoy (Oficinas_Fondo_Nacional_del_Ahorro_AAAAMMDD.csv), "
+                    "que es el que lee la app, y lo aplica al artefacto existente."
+    )
+    actualizar.add_argument('csv', help="Snapshot del CSV de oficinas descargado de datos.gov.co; "
+                                        "si no está en data/ con el patrón de snapshots, se copia allí con la fecha de hoy")
+    actualizar.add_argument('--shapefile', default=SHAPEFILE_PATH)
+    actualizar.add_argument('--salida', default=BUILD_DIR)
+
+    args = parser.parse_args(argv)
+
+    if args.comando == 'build':
+        inicio = time.perf_counter()
+        hash_fuentes = build_artifact(args.shapefile, args.csv, args.salida)
+        print(json.dumps({
+            'artefacto': args.salida,
+            'fuente_sha256': hash_fuentes,
+            'segundos': round(time.perf_counter() - inicio, 3)
+        }))
+
+    elif args.comando == 'validar':
+        _, df, _ = process_sources(args.shapefile, args.csv)
+        reporte = coordinate_report(df)
+        print(df['correccion_coordenadas'].value_counts().to_string())
+        print()
+        print(reporte.to_string(index=False))
+        print(f"\n{len(reporte)} de {len(df)} oficinas requieren revisión")
+
+    elif args.comando == 'actualizar':
+        inicio = time.perf_counter()
+        # La app lee el snapshot más reciente de data/: un CSV fuera del patrón se desharía al recompilar
+        snapshot = store_snapshot(args.csv)
+        data_unida, df, resumen = refresh_artifact(snapshot, args.shapefile, args.salida)
+        resumen['snapshot'] = snapshot
+
+        # Las teselas precalculadas dependen de los conteos y de la posición de las oficinas
+        from tiles import MBTILES_PATH, build_tiles
+        if os.path.exists(MBTILES_PATH) and (resumen['completo'] or resumen['agregadas'] or resumen['retiradas']):
+            build_tiles(data_unida, df)
+            resumen['teselas'] = MBTILES_PATH
+
+        resumen['segundos'] = round(time.perf_counter() - inicio, 3)
+        print(json.dumps(resumen, ensure_ascii=False))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
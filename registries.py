@@ -0,0 +1,155 @@
+"""Registros de oficinas de varias entidades llevados a un esquema común.
+
+Cada entidad declara dónde están sus snapshots y qué columna de su CSV
+corresponde a cada campo del esquema del dashboard (el del CSV del FNA). Todas
+las entidades se leen, normalizan y ubican en un solo lote: las oficinas llevan
+la columna `entidad` y comparten la misma capa de departamentos.
+
+Los nombres de departamento publicados se resuelven con una tabla hash compilada
+por capa y entidad (nombre normalizado -> posición del polígono): los alias de
+una entidad solo se aplican a sus propias oficinas. Solo se normalizan los
+valores distintos de la columna y el resultado se reparte por códigos, así el
+costo no crece con el número de oficinas.
+"""
+import glob
+import os
+import re
+import shutil
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Esquema común de las oficinas: columnas del CSV publicado por el FNA
+COLUMNAS_OFICINAS = [
+    'Regional', 'departamentos', 'tipodeentidad', 'cat', 'direccion', 'estado',
+    'horario actual /contingencia', 'Latitud', 'Longitud',
+]
+COLUMNAS_OBLIGATORIAS = ('departamentos', 'Latitud', 'Longitud')
+
+SNAPSHOT_PATTERN = "data/Oficinas_Fondo_Nacional_del_Ahorro_*.csv"
+
+# Entidad cuyo snapshot se puede reemplazar desde la línea de comandos (build --csv, actualizar CSV)
+ENTIDAD_PRINCIPAL = 'FNA'
+
+# Registros de oficinas por entidad. Para agregar otra entidad basta una entrada:
+#   'snapshots':  patrón glob de sus CSV (el nombre termina en la fecha AAAAMMDD)
+#   'columnas':   columna del esquema común -> columna de su CSV; las que falten quedan vacías
+#   'constantes': valor fijo para columnas que su CSV no trae (p. ej. el tipo de entidad)
+#   'lectura':    opciones de pd.read_csv (separador, decimal, codificación)
+#   'alias':      nombres de departamento propios de su CSV -> nombre del MGN
+REGISTROS = {
+    'FNA': {
+        'snapshots': SNAPSHOT_PATTERN,
+        'columnas': {columna: columna for columna in COLUMNAS_OFICINAS},
+    },
+}
+
+# Corrección de nombres en el dataset, compartida por todas las entidades
+MAPEO_NOMBRES = {
+    'HONDA': 'TOLIMA',
+    'BOGOTA  D.C.': 'BOGOTA, D.C.',
+    'BOGOTA D.C.': 'BOGOTA, D.C.',
+    'GUAJIRA': 'LA GUAJIRA',
+    'SAN ANDRES': 'ARCHIPIELAGO DE SAN ANDRES, PROVIDENCIA Y SANTA CATALINA',
+    'NORTE DE SANTADER': 'NORTE DE SANTANDER',
+    'GUANIA': 'GUAINIA',
+    'VALLE': 'VALLE DEL CAUCA'
+}
+
+def latest_snapshot(pattern=SNAPSHOT_PATTERN):
+    """Snapshot más reciente del CSV de oficinas (el nombre termina en la fecha AAAAMMDD)"""
+    rutas = sorted(glob.glob(pattern))
+    return rutas[-1] if rutas else None
+
+def registry_snapshots(csv_path=None, registros=REGISTROS):
+    """Snapshot a leer de cada entidad; `csv_path` reemplaza el de la entidad principal"""
+    rutas = {}
+    for entidad, registro in registros.items():
+        ruta = csv_path if entidad == ENTIDAD_PRINCIPAL and csv_path else latest_snapshot(registro['snapshots'])
+        if ruta:
+            rutas[entidad] = ruta
+    return rutas
+
+def store_snapshot(csv_path, entidad=ENTIDAD_PRINCIPAL, registros=REGISTROS, fecha=None):
+    """Copiar un snapshot descargado junto a los de la entidad, fechado hoy, y devolver su ruta
+
+    La app lee el snapshot más reciente del patrón de cada entidad: un CSV que
+    quede fuera del patrón se desharía la próxima vez que el artefacto se
+    compare con las fuentes.
+    """
+    patron = registros[entidad]['snapshots']
+    if os.path.abspath(csv_path) in {os.path.abspath(ruta) for ruta in glob.glob(patron)}:
+        return csv_path
+
+    destino = patron.replace('*', fecha or time.strftime('%Y%m%d'))
+    ultimo = latest_snapshot(patron)
+    if ultimo and os.path.basename(ultimo) > os.path.basename(destino):
+        raise ValueError(f"{entidad}: {ultimo} es posterior a {destino}; el snapshot nuevo no sería el que lee la app")
+    os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+    shutil.copyfile(csv_path, destino)
+    return destino
+
+def read_registry(entidad, csv_path, registros=REGISTROS):
+    """Leer un snapshot de una entidad y llevarlo al esquema común"""
+    registro = registros[entidad]
+    origen = pd.read_csv(csv_path, **registro.get('lectura', {}))
+    columnas = registro['columnas']
+    faltantes = [c for c in COLUMNAS_OBLIGATORIAS if columnas.get(c) not in origen.columns]
+    if faltantes:
+        raise ValueError(f"{entidad}: {csv_path} no tiene columnas para {', '.join(faltantes)}")
+
+    constantes = registro.get('constantes', {})
+    df = pd.DataFrame({
+        columna: origen[columnas[columna]] if columnas.get(columna) in origen.columns else constantes.get(columna)
+        for columna in COLUMNAS_OFICINAS
+    })
+    df.insert(0, 'entidad', entidad)
+    df['departamentos'] = df['departamentos'].str.upper()
+    for columna in ('Latitud', 'Longitud'):
+        df[columna] = pd.to_numeric(df[columna], errors='coerce')
+    return df
+
+def read_registries(csv_path=None, registros=REGISTROS):
+    """Oficinas de todas las entidades con snapshot disponible, en un solo DataFrame"""
+    tablas = [read_registry(entidad, ruta, registros) for entidad, ruta in registry_snapshots(csv_path, registros).items()]
+    if not tablas:
+        patrones = ', '.join(registro['snapshots'] for registro in registros.values())
+        raise FileNotFoundError(f"No hay snapshots de oficinas de ninguna entidad ({patrones})")
+    return pd.concat(tablas, ignore_index=True)
+
+def normalize_name(nombre):
+    """Nombre en mayúsculas sin tildes, puntuación ni espacios repetidos"""
+    texto = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode().upper()
+    return ' '.join(re.sub(r'[^A-Z0-9]+', ' ', texto).split())
+
+def department_aliases(entidad, registros=REGISTROS):
+    """Diccionario de normalización compartido más los alias propios de una entidad"""
+    return {**MAPEO_NOMBRES, **registros.get(entidad, {}).get('alias', {})}
+
+def compile_name_lookup(nombres, alias=None):
+    """Tabla hash nombre normalizado -> posición en `nombres`, con los alias ya resueltos"""
+    tabla = {normalize_name(nombre): i for i, nombre in enumerate(nombres)}
+    for variante, nombre in (MAPEO_NOMBRES if alias is None else alias).items():
+        destino = tabla.get(normalize_name(nombre))
+        if destino is not None:
+            tabla.setdefault(normalize_name(variante), destino)
+    return tabla
+
+def declared_departments(df, nombres, registros=REGISTROS):
+    """Posición en `nombres` del departamento declarado de cada oficina, con los alias de su entidad"""
+    entidades = df['entidad'].to_numpy(dtype=object) if 'entidad' in df.columns else np.full(len(df), ENTIDAD_PRINCIPAL, dtype=object)
+    declarado = np.full(len(df), -1, dtype=np.int64)
+    for entidad in pd.unique(entidades):
+        filas = entidades == entidad
+        tabla = compile_name_lookup(nombres, department_aliases(entidad, registros))
+        declarado[filas] = lookup_names(df['departamentos'].to_numpy(dtype=object)[filas], tabla)
+    return declarado
+
+def lookup_names(valores, tabla):
+    """Posición de cada nombre en la tabla compilada, -1 si no se reconoce"""
+    codigos, unicos = pd.factorize(pd.Series(valores, dtype=object))
+    # El código -1 (valor faltante) toma la última posición, también -1
+    posiciones = np.array([tabla.get(normalize_name(valor), -1) for valor in unicos] + [-1], dtype=np.int64)
+    return posiciones[codigos]
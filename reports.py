@@ -0,0 +1,157 @@
+"""Reportes estáticos del dashboard FNA por región y rango de oficinas, sin Streamlit.
+
+Cada combinación de filtros produce el mapa (HTML) y la tabla de detalle (JSON).
+Los gráficos de top 7 y de distribución (HTML y, con --png, PNG) son los del
+dashboard, que no dependen de los filtros: se generan una sola vez en
+graficos/ y todas las entradas del índice los referencian. Las combinaciones
+se reparten en un pool de procesos que comparten un solo conjunto de datos
+cargado.
+
+Uso:
+    python reports.py                                   Todas las regiones con los rangos por defecto
+    python reports.py --regiones ANTIOQUIA "BOGOTA, D.C." --rangos 1-20 4-20
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+REPORTS_DIR = "reportes"
+
+# Rangos de número de oficinas por departamento
+RANGOS_POR_DEFECTO = ((1, 20), (1, 1), (2, 3), (4, 20))
+
+# Datos compartidos por los workers: con fork se heredan del proceso padre sin copiarlos
+# (copy-on-write); con spawn cada worker mapea en memoria el mismo artefacto en disco
+_DATOS = None
+
+def load_report_data():
+    """Departamentos con conteos y oficinas agrupadas al zoom del mapa estático"""
+    from pipeline import build_point_clusters, load_or_build_artifact
+
+    data_unida, df = load_or_build_artifact()
+    ubicadas = df[~df['fuera_de_poligonos']]
+    puntos = build_point_clusters(ubicadas['latitud_corregida'], ubicadas['longitud_corregida'], niveles=(5,))
+    return data_unida, puntos
+
+def _init_worker():
+    global _DATOS
+    if _DATOS is None:
+        _DATOS = load_report_data()
+
+def slug(texto):
+    """Nombre de carpeta en ASCII para una combinación de filtros"""
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', '-', texto.lower()).strip('-')
+
+def report_tasks(regiones, rangos):
+    """Combinaciones de región (None = todo el país) y rango de oficinas"""
+    return [(region, rango) for region in [None, *regiones] for rango in rangos]
+
+def render_charts(data_unida, salida, png=False):
+    """Gráficos de top 7 y distribución con los mismos datos que el dashboard (sin filtros de región ni rango)"""
+    from visuals import create_distribution_chart, create_top_departments_chart
+
+    carpeta = os.path.join(salida, 'graficos')
+    os.makedirs(carpeta, exist_ok=True)
+    archivos = {}
+    graficos = {
+        'top7': create_top_departments_chart(data_unida),
+        'distribucion': create_distribution_chart(data_unida),
+    }
+    for nombre, figura in graficos.items():
+        archivos[nombre] = os.path.join(carpeta, f'{nombre}.html')
+        figura.write_html(archivos[nombre], include_plotlyjs='cdn')
+        if png:
+            archivos[f'{nombre}_png'] = os.path.join(carpeta, f'{nombre}.png')
+            figura.write_image(archivos[f'{nombre}_png'], width=800, height=400)
+    return archivos
+
+def render_report(region, rango, salida, map_type='thematic', graficos=None):
+    """Generar los archivos de una combinación de filtros y devolver su entrada del índice"""
+    from visuals import create_folium_map, filter_data
+
+    data_unida, puntos = _DATOS
+    regiones = [region] if region else []
+    filtrados = filter_data(data_unida, rango, regiones)
+
+    carpeta = os.path.join(salida, slug(f"{region or 'colombia'}-{rango[0]}-{rango[1]}"))
+    os.makedirs(carpeta, exist_ok=True)
+    # Gráficos compartidos por todas las combinaciones, como en el dashboard
+    archivos = dict(graficos or {})
+
+    mapa = create_folium_map(data_unida, filtrados, map_type, points=puntos)
+    archivos['mapa'] = os.path.join(carpeta, 'mapa.html')
+    mapa.save(archivos['mapa'])
+
+    tabla = filtrados[['DPTO_CNMBR', 'cantidad_oficinas']].sort_values('cantidad_oficinas', ascending=False)
+    archivos['tabla'] = os.path.join(carpeta, 'tabla.json')
+    with open(archivos['tabla'], 'w', encoding='utf-8') as f:
+        json.dump(tabla.to_dict(orient='records'), f, ensure_ascii=False, indent=2)
+
+    return {
+        'region': region,
+        'rango': list(rango),
+        'departamentos': len(filtrados),
+        'oficinas': int(filtrados['cantidad_oficinas'].sum()),
+        'archivos': archivos,
+    }
+
+def parse_range(texto):
+    minimo, _, maximo = texto.partition('-')
+    return (int(minimo), int(maximo or minimo))
+
+def main(argv=None):
+    global _DATOS
+
+    parser = argparse.ArgumentParser(description="Reportes estáticos del dashboard FNA")
+    parser.add_argument('--regiones', nargs='*', default=None,
+                        help="Departamentos (DPTO_CNMBR_NORM); por defecto todos los que tienen oficinas")
+    parser.add_argument('--rangos', nargs='+', type=parse_range, default=list(RANGOS_POR_DEFECTO),
+                        metavar='MIN-MAX')
+    parser.add_argument('--tipo-mapa', choices=['thematic', 'blues'], default='thematic')
+    parser.add_argument('--png', action='store_true', help="Exportar también los gráficos en PNG (requiere kaleido)")
+    parser.add_argument('--salida', default=REPORTS_DIR)
+    parser.add_argument('--procesos', type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    if args.png and importlib.util.find_spec('kaleido') is None:
+        parser.error("--png requiere el paquete kaleido (pip install kaleido)")
+
+    inicio = time.perf_counter()
+
+    # Cargar una sola vez antes de crear el pool: los workers creados con fork lo heredan
+    _DATOS = load_report_data()
+    data_unida = _DATOS[0]
+    regiones = args.regiones
+    if regiones is None:
+        regiones = sorted(data_unida.loc[data_unida['cantidad_oficinas'] > 0, 'DPTO_CNMBR_NORM'])
+
+    graficos = render_charts(data_unida, args.salida, args.png)
+
+    contexto = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+    tareas = report_tasks(regiones, args.rangos)
+    with ProcessPoolExecutor(max_workers=args.procesos, mp_context=contexto, initializer=_init_worker) as pool:
+        futuros = [pool.submit(render_report, region, rango, args.salida, args.tipo_mapa, graficos)
+                   for region, rango in tareas]
+        indice = [futuro.result() for futuro in futuros]
+
+    os.makedirs(args.salida, exist_ok=True)
+    with open(os.path.join(args.salida, 'indice.json'), 'w', encoding='utf-8') as f:
+        json.dump(indice, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps({
+        'reportes': len(indice),
+        'salida': args.salida,
+        'segundos': round(time.perf_counter() - inicio, 3)
+    }))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""La actualización incremental del artefacto da lo mismo que compilarlo completo.
+
+Capa sintética de tres departamentos (uno partido en dos municipios) y dos
+snapshots del CSV de oficinas: el segundo agrega, mueve y retira oficinas,
+también entre oficinas repetidas con la misma dirección.
+
+Se ejecuta con pytest o directamente: python tests/test_incremental_refresh.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+from pipeline import (
+    MPIO_SHAPEFILE_PATH, SHAPEFILE_PATH, build_artifact, load_artifact, load_office_facts, refresh_artifact
+)
+from registries import COLUMNAS_OFICINAS
+
+DEPARTAMENTOS = gpd.GeoDataFrame({
+    'DPTO_CCDGO': ['05', '08', '11'],
+    'DPTO_CNMBR': ['ANTIOQUIA', 'ATLÁNTICO', 'BOGOTÁ, D.C.'],
+    'geometry': [shapely.box(-76, 6, -75, 7), shapely.box(-75, 10, -74, 11), shapely.box(-74.5, 4, -73.5, 5)],
+}, crs='EPSG:4326')
+
+MUNICIPIOS = gpd.GeoDataFrame({
+    'DPTO_CCDGO': ['05', '05', '08', '11'],
+    'MPIO_CCNCT': ['05001', '05002', '08001', '11001'],
+    'geometry': [
+        shapely.box(-76, 6, -75.5, 7), shapely.box(-75.5, 6, -75, 7),
+        shapely.box(-75, 10, -74, 11), shapely.box(-74.5, 4, -73.5, 5),
+    ],
+}, crs='EPSG:4326')
+
+def office(regional, departamento, direccion, latitud, longitud, estado='ACTIVA'):
+    fila = dict.fromkeys(COLUMNAS_OFICINAS)
+    fila.update({
+        'Regional': regional, 'departamentos': departamento, 'tipodeentidad': 'OFICINA', 'cat': 'CAT',
+        'direccion': direccion, 'estado': estado, 'Latitud': latitud, 'Longitud': longitud,
+    })
+    return fila
+
+ANTERIOR = [
+    office('NOROCCIDENTE', 'ANTIOQUIA', 'CALLE 1', 6.5, -75.75),
+    office('NOROCCIDENTE', 'ANTIOQUIA', 'CALLE 1', 6.5, -75.75),
+    office('NOROCCIDENTE', 'ANTIOQUIA', 'CALLE 1', 6.5, -75.75),
+    office('NOROCCIDENTE', 'ANTIOQUIA', 'CALLE 2', 6.5, 75.25),
+    office('CARIBE', 'ATLANTICO', 'CARRERA 3', 10.5, -74.5),
+    office('CARIBE', 'ATLANTICO', 'CARRERA 4', 10.5, -74.5),
+    office('CENTRO', 'BOGOTA D.C.', 'AVENIDA 5', 4.5, -74.0),
+    office('CENTRO', 'BOGOTA D.C.', 'AVENIDA 6', 30.0, 30.0),
+]
+
+NUEVO = [
+    # Una de las tres oficinas repetidas se retira
+    office('NOROCCIDENTE', 'ANTIOQUIA', 'CALLE 1', 6.5, -75.75),
+    office('NOROCCIDENTE', 'ANTIOQUIA', 'CALLE 1', 6.5, -75.75),
+    # Misma dirección, otro municipio
+    office('NOROCCIDENTE', 'ANTIOQUIA', 'CALLE 2', 6.5, -75.75),
+    office('CARIBE', 'ATLANTICO', 'CARRERA 3', 10.5, -74.5),
+    # Se mueve a otro departamento (y queda en conflicto con el declarado)
+    office('CARIBE', 'ATLANTICO', 'CARRERA 4', 4.5, -74.0),
+    office('CENTRO', 'BOGOTA D.C.', 'AVENIDA 5', 4.5, -74.0),
+    # Nuevas: una repetida de una existente y una con la longitud sin signo
+    office('CENTRO', 'BOGOTA D.C.', 'AVENIDA 5', 4.5, -74.0),
+    office('CARIBE', 'ATLANTICO', 'CARRERA 7', 10.25, 74.25, estado='CERRADA'),
+]
+
+def write_fixture(raiz):
+    for capa, ruta in ((DEPARTAMENTOS, SHAPEFILE_PATH), (MUNICIPIOS, MPIO_SHAPEFILE_PATH)):
+        os.makedirs(os.path.join(raiz, os.path.dirname(ruta)), exist_ok=True)
+        capa.to_file(os.path.join(raiz, ruta), encoding='utf-8')
+    rutas = []
+    for nombre, filas in (('Oficinas_Fondo_Nacional_del_Ahorro_20250101.csv', ANTERIOR),
+                          ('Oficinas_Fondo_Nacional_del_Ahorro_20250201.csv', NUEVO)):
+        rutas.append(os.path.join('data', nombre))
+        pd.DataFrame(filas).to_csv(os.path.join(raiz, rutas[-1]), index=False)
+    return rutas
+
+def sorted_facts(hechos):
+    dimensiones = [c for c in hechos.columns if c != 'cantidad_oficinas']
+    return hechos.astype({c: object for c in dimensiones}).fillna('').sort_values(dimensiones).reset_index(drop=True)
+
+def test_refresh_matches_full_build():
+    directorio = os.getcwd()
+    with tempfile.TemporaryDirectory() as raiz:
+        # Las rutas por defecto del pipeline (capas, población) son relativas al directorio de trabajo
+        os.chdir(raiz)
+        try:
+            anterior, nuevo = write_fixture(raiz)
+            build_artifact(SHAPEFILE_PATH, anterior, 'incremental')
+            departamentos, oficinas, resumen = refresh_artifact(nuevo, SHAPEFILE_PATH, 'incremental')
+            assert not resumen['completo']
+            assert (resumen['conservadas'], resumen['agregadas'], resumen['retiradas']) == (4, 4, 4)
+            assert resumen['departamentos_afectados'] == ['05', '08']
+
+            build_artifact(SHAPEFILE_PATH, nuevo, 'completo')
+            esperados_departamentos, esperadas_oficinas = load_artifact(SHAPEFILE_PATH, nuevo, 'completo')
+
+            # El artefacto incremental en disco corresponde al snapshot nuevo
+            assert load_artifact(SHAPEFILE_PATH, nuevo, 'incremental') is not None
+
+            assert departamentos['cantidad_oficinas'].tolist() == esperados_departamentos['cantidad_oficinas'].tolist()
+            assert departamentos['cantidad_oficinas'].tolist() == [3, 3, 2]
+            pd.testing.assert_frame_equal(oficinas.reset_index(drop=True), esperadas_oficinas, check_dtype=False)
+            pd.testing.assert_frame_equal(sorted_facts(load_office_facts('incremental')),
+                                          sorted_facts(load_office_facts('completo')))
+        finally:
+            os.chdir(directorio)
+
+if __name__ == '__main__':
+    test_refresh_matches_full_build()
+    print("ok")
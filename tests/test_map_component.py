@@ -0,0 +1,62 @@
+"""Compatibilidad con las funciones internas de streamlit-folium que usa el mapa en caché.
+
+app.show_map y visuals.render_map_component reproducen st_folium con las cadenas ya
+renderizadas; si una versión de streamlit-folium cambia esas funciones, falla aquí y
+no en el navegador. Se ejecuta con pytest o directamente: python tests/test_map_component.py
+"""
+import ast
+import inspect
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import folium
+
+def component_arguments(arbol):
+    """Nombres de los argumentos con que se llama a _component_func dentro de un módulo"""
+    for nodo in ast.walk(arbol):
+        if isinstance(nodo, ast.Call) and getattr(nodo.func, 'id', None) == '_component_func':
+            return {argumento.arg for argumento in nodo.keywords}
+    return None
+
+# Funciones de streamlit-folium que importan app.show_map y visuals.render_*
+FUNCIONES_INTERNAS = (
+    '_component_func', '_get_feature_group_string', '_get_header', '_get_html', '_get_map_string',
+    'generate_js_hash', 'get_full_id',
+)
+
+def test_private_helpers_exist():
+    import streamlit_folium
+
+    faltantes = [nombre for nombre in FUNCIONES_INTERNAS if not callable(getattr(streamlit_folium, nombre, None))]
+    assert not faltantes, faltantes
+
+def test_show_map_passes_the_same_arguments_as_st_folium():
+    import streamlit_folium
+
+    with open(os.path.join(RAIZ, 'app.py'), encoding='utf-8') as archivo:
+        propios = component_arguments(ast.parse(archivo.read()))
+    esperados = component_arguments(ast.parse(inspect.getsource(streamlit_folium)))
+    assert esperados is not None and propios == esperados, (propios, esperados)
+
+def test_render_map_component():
+    from visuals import render_map_component, render_style_layer
+
+    mapa = folium.Map(location=[4.6, -74.1], zoom_start=5, tiles=None)
+    folium.GeoJson({'type': 'Point', 'coordinates': [-74.1, 4.6]}).add_to(mapa)
+    componente = render_map_component(mapa, 'mapa')
+    assert componente['id'] in componente['script']
+    assert componente['zoom'] == 5 and componente['clave']
+
+    capa = folium.FeatureGroup(name='Estilos')
+    folium.CircleMarker([4.6, -74.1]).add_to(capa)
+    estilos = render_style_layer(capa)
+    assert 'circleMarker' in estilos['script'] or 'circle_marker' in estilos['script']
+
+if __name__ == '__main__':
+    test_private_helpers_exist()
+    test_show_map_passes_the_same_arguments_as_st_folium()
+    test_render_map_component()
+    print("ok")
@@ -0,0 +1,82 @@
+"""Asignación de oficinas a departamentos con corrección de signo, sobre polígonos sintéticos.
+
+Se ejecuta con pytest o directamente: python tests/test_office_assignment.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from pipeline import assign_offices_to_departments, coordinate_report
+
+# Departamentos (lon, lat): 0 y 1 son espejo en longitud, 2 está lejos de ambos
+DEPARTAMENTOS = np.array([
+    shapely.box(-75, 4, -74, 5),
+    shapely.box(74, 4, 75, 5),
+    shapely.box(-73, 6, -72, 7),
+], dtype=object)
+
+def test_swapped_sign_resolves_to_declared_department():
+    # Longitud publicada sin signo: la variante original cae en el departamento 1
+    sin_declarar = assign_offices_to_departments([4.5], [74.5], DEPARTAMENTOS)
+    assert sin_declarar['departamento'].tolist() == [1]
+    assert sin_declarar['correccion_coordenadas'].tolist() == ['ninguna']
+
+    # Declarada en el 0: se prefiere la variante con la longitud invertida
+    asignacion = assign_offices_to_departments([4.5, -6.5], [74.5, 72.5], DEPARTAMENTOS, declared=[0, 2])
+    assert asignacion['departamento'].tolist() == [0, 2]
+    assert asignacion['poligono'].tolist() == [0, 2]
+    assert asignacion['correccion_coordenadas'].tolist() == ['longitud', 'ambas']
+    assert np.allclose(asignacion['latitud_corregida'], [4.5, 6.5])
+    assert np.allclose(asignacion['longitud_corregida'], [-74.5, -72.5])
+    assert not asignacion['fuera_de_poligonos'].any()
+    assert not asignacion['conflicto_departamento'].any()
+
+def test_point_outside_every_polygon():
+    asignacion = assign_offices_to_departments([30.0, 4.5], [30.0, -74.5], DEPARTAMENTOS)
+    assert asignacion['fuera_de_poligonos'].tolist() == [True, False]
+    assert asignacion['departamento'].tolist() == [-1, 0]
+    assert asignacion['poligono'].tolist() == [-1, 0]
+    # Sin variante válida se conservan las coordenadas publicadas
+    assert asignacion['correccion_coordenadas'].tolist() == ['ninguna', 'ninguna']
+    assert asignacion['latitud_corregida'].iat[0] == 30.0
+    assert not asignacion['conflicto_departamento'].any()
+
+def test_declared_department_without_matching_variant_is_a_conflict():
+    # Ninguna variante de signo cae en el departamento 2 declarado
+    asignacion = assign_offices_to_departments([4.5], [-74.5], DEPARTAMENTOS, declared=[2])
+    assert asignacion['departamento'].tolist() == [2]
+    assert asignacion['poligono'].tolist() == [-1]
+    assert asignacion['conflicto_departamento'].tolist() == [True]
+    assert asignacion['fuera_de_poligonos'].tolist() == [False]
+
+def test_groups_map_finer_polygons_to_departments():
+    # Dos municipios por departamento 0: la variante se elige por el departamento del municipio
+    municipios = np.array([shapely.box(-75, 4, -74.5, 5), shapely.box(-74.5, 4, -74, 5), DEPARTAMENTOS[1]], dtype=object)
+    asignacion = assign_offices_to_departments(
+        [4.5, 4.5], [74.75, 74.25], municipios, declared=[0, 1], groups=[0, 0, 1]
+    )
+    assert asignacion['poligono'].tolist() == [0, 2]
+    assert asignacion['departamento'].tolist() == [0, 1]
+    assert asignacion['correccion_coordenadas'].tolist() == ['longitud', 'ninguna']
+
+def test_coordinate_report_lists_atypical_rows():
+    asignacion = assign_offices_to_departments(
+        [4.5, 4.5, 4.5, 30.0, 4.5], [-74.5, -74.5, 74.5, 30.0, -74.5], DEPARTAMENTOS, declared=[0, 0, 0, -1, 2]
+    )
+    df = pd.concat([pd.DataFrame({'Latitud': [4.5] * 5, 'Longitud': [-74.5] * 5}), asignacion], axis=1)
+    reporte = coordinate_report(df)
+    # La corrección predominante ('ninguna') no se reporta; sí la atípica, la fuera y el conflicto
+    assert reporte.index.tolist() == [2, 3, 4]
+
+if __name__ == '__main__':
+    test_swapped_sign_resolves_to_declared_department()
+    test_point_outside_every_polygon()
+    test_declared_department_without_matching_variant_is_a_conflict()
+    test_groups_map_finer_polygons_to_departments()
+    test_coordinate_report_lists_atypical_rows()
+    print("ok")
@@ -0,0 +1,77 @@
+"""Conteos por departamento con los índices de bitmaps frente a un groupby de pandas.
+
+Se ejecuta con pytest o directamente: python tests/test_office_index.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from office_index import (
+    COLUMNA_HORARIO, MAX_VALORES_BITMAP, SIN_DATO, build_office_index, department_counts, office_mask
+)
+
+def random_offices(n=5000, semilla=0):
+    """Oficinas con valores sucios (espacios, vacíos, horarios en texto libre) y departamentos fuera de la capa"""
+    rng = np.random.default_rng(semilla)
+    departamentos = pd.DataFrame({'DPTO_CCDGO': [f'{i:02d}' for i in range(1, 33)]})
+    df = pd.DataFrame({
+        'DPTO_CCDGO': rng.choice(departamentos['DPTO_CCDGO'].tolist() + ['99', None], n),
+        'entidad': rng.choice(['FNA', 'OTRA'], n),
+        'estado': rng.choice(['ACTIVA', ' ACTIVA ', 'CERRADA', 'EN  OBRA', '', None], n),
+        'tipodeentidad': rng.choice(['OFICINA', 'PUNTO', 'CORRESPONSAL'], n),
+        'cat': rng.choice([f'CAT {i}' for i in range(MAX_VALORES_BITMAP + 36)] + ['CAT  1', None], n),
+        COLUMNA_HORARIO: rng.choice([
+            'Lunes a viernes 8-5', 'Lunes a viernes 8-5; sábados 8-12', 'LUNES A SABADO 8-12',
+            'sabado 9-1', 'L-V', '', None,
+        ], n),
+    })
+    return df, departamentos
+
+def reference_values(df):
+    """Valores normalizados de cada atributo calculados directamente con pandas"""
+    valores = {}
+    for columna in ('entidad', 'estado', 'tipodeentidad', 'cat'):
+        texto = df[columna].fillna('').str.split().str.join(' ')
+        valores[columna] = texto.where(texto != '', SIN_DATO)
+    horario = df[COLUMNA_HORARIO].fillna('')
+    sabados = np.where(horario.str.contains('S[AÁ]BADO', case=False, regex=True), 'Sí', 'No')
+    valores['atiende_sabados'] = pd.Series(np.where(horario.str.strip() == '', SIN_DATO, sabados), index=df.index)
+    return pd.DataFrame(valores)
+
+def test_counts_match_groupby():
+    df, departamentos = random_offices()
+    indice = build_office_index(df, departamentos)
+    referencia = reference_values(df)
+
+    # 'cat' supera el máximo de valores con bitmap: guarda los códigos de cada oficina
+    assert 'codigos' in indice['atributos']['cat'] and 'bitmaps' not in indice['atributos']['cat']
+    assert all('bitmaps' in indice['atributos'][c] for c in ('entidad', 'estado', 'tipodeentidad', 'atiende_sabados'))
+    for columna, atributo in indice['atributos'].items():
+        assert atributo['valores'] == sorted(referencia[columna].unique()), columna
+
+    rng = np.random.default_rng(1)
+    columnas = list(indice['atributos'])
+    for _ in range(200):
+        elegidas = rng.choice(columnas, rng.integers(0, len(columnas) + 1), replace=False)
+        filtros = []
+        for columna in elegidas:
+            posibles = indice['atributos'][columna]['valores']
+            filtros.append((columna, tuple(rng.choice(posibles, rng.integers(1, len(posibles) + 1), replace=False))))
+        filtros = tuple(filtros)
+
+        esperada = np.ones(len(df), dtype=bool)
+        for columna, valores in filtros:
+            esperada &= referencia[columna].isin(valores).to_numpy()
+        mascara = office_mask(indice, filtros)
+        assert np.array_equal(mascara, esperada), filtros
+
+        esperados = df[esperada].groupby('DPTO_CCDGO').size().reindex(departamentos['DPTO_CCDGO'], fill_value=0)
+        assert np.array_equal(department_counts(indice, mascara), esperados.to_numpy()), filtros
+
+if __name__ == '__main__':
+    test_counts_match_groupby()
+    print("ok")
@@ -0,0 +1,92 @@
+"""Registros de dos entidades con esquemas y alias distintos llevados al esquema común.
+
+Se ejecuta con pytest o directamente: python tests/test_registries.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from pipeline import build_office_facts, rollup
+from registries import COLUMNAS_OFICINAS, declared_departments, read_registries
+
+NOMBRES = pd.Series(['ANTIOQUIA', 'BOGOTÁ, D.C.', 'TOLIMA'])
+
+def two_registries(raiz):
+    """FNA con su CSV publicado y otra entidad con columnas, separador y decimales propios
+
+    Las dos usan el alias CAPITAL para departamentos distintos.
+    """
+    registros = {
+        'FNA': {
+            'snapshots': os.path.join(raiz, 'fna_*.csv'),
+            'columnas': {columna: columna for columna in COLUMNAS_OFICINAS},
+            'alias': {'CAPITAL': 'BOGOTA, D.C.'},
+        },
+        'COOP': {
+            'snapshots': os.path.join(raiz, 'coop_*.csv'),
+            'columnas': {'departamentos': 'DEPTO', 'direccion': 'DIR', 'Latitud': 'LAT', 'Longitud': 'LON',
+                         'Regional': 'ZONA'},
+            'constantes': {'tipodeentidad': 'COOPERATIVA'},
+            'lectura': {'sep': ';', 'decimal': ','},
+            'alias': {'CAPITAL': 'ANTIOQUIA'},
+        },
+    }
+    pd.DataFrame({
+        'Regional': ['CENTRO', 'CENTRO', 'CENTRO'], 'departamentos': ['Capital', 'Honda', 'Antioquia'],
+        'tipodeentidad': ['OFICINA'] * 3, 'cat': ['A'] * 3, 'direccion': ['CALLE 1', 'CALLE 2', 'CALLE 3'],
+        'estado': ['ACTIVA'] * 3, 'horario actual /contingencia': [None] * 3,
+        'Latitud': [4.6, 5.2, 6.2], 'Longitud': [-74.1, -74.7, -75.6],
+    }).to_csv(os.path.join(raiz, 'fna_20250101.csv'), index=False)
+    # Un snapshot viejo de la otra entidad que no se debe leer
+    for fecha, departamento in (('20240101', 'TOLIMA'), ('20250101', 'CAPITAL')):
+        pd.DataFrame({
+            'DEPTO': [departamento, 'bogota d.c.'], 'DIR': ['CRA 9', 'CRA 10'],
+            'LAT': ['6,25', '4,61'], 'LON': ['-75,56', '-74,08'], 'ZONA': ['NORTE', 'SUR'],
+        }).to_csv(os.path.join(raiz, f'coop_{fecha}.csv'), sep=';', index=False)
+    return registros
+
+def test_schema_mappings_and_aliases_per_registry():
+    with tempfile.TemporaryDirectory() as raiz:
+        registros = two_registries(raiz)
+        df = read_registries(None, registros)
+
+    assert df.columns.tolist() == ['entidad'] + COLUMNAS_OFICINAS
+    assert df['entidad'].tolist() == ['FNA'] * 3 + ['COOP'] * 2
+    coop = df[df['entidad'] == 'COOP']
+    assert coop['departamentos'].tolist() == ['CAPITAL', 'BOGOTA D.C.']
+    assert np.allclose(coop['Latitud'], [6.25, 4.61]) and np.allclose(coop['Longitud'], [-75.56, -74.08])
+    assert (coop['tipodeentidad'] == 'COOPERATIVA').all()
+    assert coop['estado'].isna().all()
+
+    # CAPITAL es Bogotá para el FNA y Antioquia para la otra entidad; el diccionario común aplica a ambas
+    declarado = declared_departments(df, NOMBRES, registros)
+    assert declarado.tolist() == [1, 2, 0, 0, 1]
+
+    # Sin el registro de la otra entidad su alias no existe, y el del FNA no se le presta
+    solo_fna = {'FNA': registros['FNA']}
+    assert declared_departments(df, NOMBRES, solo_fna).tolist() == [1, 2, 0, -1, 1]
+    assert declared_departments(df, NOMBRES, {}).tolist() == [-1, 2, 0, -1, 1]
+
+def test_fact_table_keeps_the_entity_dimension():
+    with tempfile.TemporaryDirectory() as raiz:
+        registros = two_registries(raiz)
+        df = read_registries(None, registros)
+    df['DPTO_CCDGO'] = np.array(['05', '11', '73'], dtype=object)[declared_departments(df, NOMBRES, registros)]
+    df['MPIO_CCNCT'] = None
+
+    hechos = build_office_facts(df)
+    assert hechos['cantidad_oficinas'].sum() == len(df)
+    assert rollup(hechos, 'entidad').to_dict() == {'COOP': 2, 'FNA': 3}
+    por_departamento = rollup(hechos, 'entidad', 'departamento')
+    assert por_departamento.to_dict() == {('COOP', '05'): 1, ('COOP', '11'): 1, ('FNA', '05'): 1, ('FNA', '11'): 1,
+                                          ('FNA', '73'): 1}
+
+if __name__ == '__main__':
+    test_schema_mappings_and_aliases_per_registry()
+    test_fact_table_keeps_the_entity_dimension()
+    print("ok")
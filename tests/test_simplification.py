@@ -0,0 +1,64 @@
+"""Regresión de la simplificación por zoom con fronteras compartidas que no coinciden exactamente.
+
+Se ejecuta con pytest o directamente: python tests/test_simplification.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import shapely
+
+from pipeline import NIVELES_ZOOM, simplify_preserving_topology, within_simplification_error, zoom_tolerance
+
+def wavy_departments(filas=4, columnas=5, paso=1.0, segmento=0.005):
+    """Rejilla de polígonos vecinos con fronteras onduladas y miles de vértices"""
+    x, y = np.meshgrid(np.arange(columnas) * paso - 75, np.arange(filas) * paso + 2)
+    celdas = shapely.segmentize(shapely.box(x.ravel(), y.ravel(), x.ravel() + paso, y.ravel() + paso), segmento)
+
+    def ondular(c):
+        return c + 0.15 * np.sin(c[:, ::-1] * 3)
+
+    return shapely.transform(celdas, ondular)
+
+def jitter(geoms, amplitud=1e-9):
+    """Mover cada vértice según su coordenada y su polígono: los anillos siguen cerrados, los vecinos ya no coinciden"""
+    return np.array([
+        shapely.transform(g, lambda c, i=i: c + amplitud * np.sin(c[:, ::-1] * 1e7 + i))
+        for i, g in enumerate(geoms)
+    ], dtype=object)
+
+def test_jittered_borders_keep_each_department():
+    originales = jitter(wavy_departments())
+    for zoom in NIVELES_ZOOM:
+        tolerancia = zoom_tolerance(zoom)
+        simplificadas = simplify_preserving_topology(originales, tolerancia)
+
+        # Ningún departamento se queda con caras de sus vecinos ni las pierde
+        assert within_simplification_error(simplificadas, originales, tolerancia).all()
+        proporcion = shapely.area(simplificadas) / shapely.area(originales)
+        assert np.abs(proporcion - 1).max() < 0.01, proporcion
+
+        # Los niveles no se superponen
+        solape = shapely.area(simplificadas).sum() - shapely.area(shapely.union_all(simplificadas))
+        assert solape < 1e-6 * shapely.area(originales).sum(), solape
+
+        # Y sí se simplificó: no es el respaldo con la geometría original
+        assert shapely.get_num_coordinates(simplificadas).sum() < shapely.get_num_coordinates(originales).sum() / 4
+
+def test_borrowed_faces_are_out_of_tolerance():
+    originales = wavy_departments()
+    tolerancia = zoom_tolerance(NIVELES_ZOOM[0])
+    simplificadas = originales.copy()
+    simplificadas[0] = shapely.union_all(originales[[0, 1]])
+    simplificadas[1] = shapely.Polygon()
+
+    dentro = within_simplification_error(simplificadas, originales, tolerancia)
+    assert not dentro[0] and not dentro[1]
+    assert dentro[2:].all()
+
+if __name__ == '__main__':
+    test_jittered_borders_keep_each_department()
+    test_borrowed_faces_are_out_of_tolerance()
+    print("ok")
@@ -0,0 +1,86 @@
+"""Ida y vuelta del TopoJSON cuantizado: geometría dentro de un paso de la rejilla y fronteras compartidas.
+
+Se ejecuta con pytest o directamente: python tests/test_topojson.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import shapely
+
+from topology import OBJETO_TOPOJSON, encode_topojson
+
+PASO = 1e-3
+
+def neighbours_and_enclave():
+    """Dos departamentos con una frontera ondulada común y un enclave dentro del primero"""
+    y = np.linspace(4, 6, 400)
+    frontera = np.column_stack([-74 + 0.1 * np.sin(y * 7), y])
+    oeste = shapely.Polygon(np.vstack([[[-76, 6], [-76, 4]], frontera]))
+    este = shapely.Polygon(np.vstack([frontera, [[-72, 6], [-72, 4]]]))
+    enclave = shapely.box(-75.5, 4.5, -75, 5)
+    return np.array([oeste.difference(enclave), este, enclave], dtype=object)
+
+def decode_arcs(topologia):
+    """Arcos en grados: suma acumulada de los deltas, escala y traslación"""
+    escala = np.array(topologia['transform']['scale'])
+    traslacion = np.array(topologia['transform']['translate'])
+    return [np.cumsum(np.array(arco, dtype=float), axis=0) * escala + traslacion for arco in topologia['arcs']]
+
+def decode_ring(indices, arcos):
+    """Anillo a partir de sus arcos; ~i es el arco i recorrido al revés y cada arco repite el último punto del anterior"""
+    partes = [arcos[i] if i >= 0 else arcos[~i][::-1] for i in indices]
+    return np.vstack([partes[0]] + [parte[1:] for parte in partes[1:]])
+
+def decode_geometry(objeto, arcos):
+    if objeto['type'] == 'Polygon':
+        anillos = [decode_ring(a, arcos) for a in objeto['arcs']]
+        return shapely.Polygon(anillos[0], anillos[1:])
+    return shapely.MultiPolygon([
+        shapely.Polygon(anillos[0], anillos[1:])
+        for anillos in ([decode_ring(a, arcos) for a in poligono] for poligono in objeto['arcs'])
+    ])
+
+def arc_usage(objeto):
+    """Índice (sin sentido) de cada arco que usa una geometría"""
+    anillos = objeto['arcs'] if objeto['type'] == 'Polygon' else [a for p in objeto['arcs'] for a in p]
+    return {i if i >= 0 else ~i for anillo in anillos for i in anillo}
+
+def test_round_trip_within_one_step():
+    originales = neighbours_and_enclave()
+    topologia = encode_topojson(originales, [{'n': i} for i in range(3)], ['a', 'b', 'c'], PASO)
+    objetos = topologia['objects'][OBJETO_TOPOJSON]['geometries']
+    assert [o['id'] for o in objetos] == ['a', 'b', 'c']
+    assert [o['properties'] for o in objetos] == [{'n': 0}, {'n': 1}, {'n': 2}]
+
+    arcos = decode_arcs(topologia)
+    for original, objeto in zip(originales, objetos):
+        decodificada = decode_geometry(objeto, arcos)
+        assert decodificada.is_valid
+        distancia = shapely.hausdorff_distance(original, decodificada)
+        assert distancia <= PASO, distancia
+
+def test_shared_borders_are_single_arcs():
+    topologia = encode_topojson(neighbours_and_enclave(), [{}] * 3, [0, 1, 2], PASO)
+    oeste, este, enclave = (arc_usage(o) for o in topologia['objects'][OBJETO_TOPOJSON]['geometries'])
+
+    # La frontera ondulada es un solo arco de ambos vecinos, recorrido en sentidos opuestos
+    comunes = oeste & este
+    assert len(comunes) == 1
+    assert len(topologia['arcs'][comunes.pop()]) > 100
+
+    # El hueco del primero y el exterior del enclave son el mismo arco
+    assert len(enclave) == 1 and enclave <= oeste
+    # Exterior propio de cada vecino, la frontera y el enclave
+    assert len(topologia['arcs']) == 4
+
+    # Los arcos son deltas enteros en la rejilla
+    deltas = np.abs(np.concatenate([np.array(arco)[1:] for arco in topologia['arcs']]))
+    assert deltas.dtype.kind == 'i'
+
+if __name__ == '__main__':
+    test_round_trip_within_one_step()
+    test_shared_borders_are_single_arcs()
+    print("ok")
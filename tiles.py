@@ -0,0 +1,307 @@
+"""Teselas vectoriales (MVT) de departamentos y oficinas.
+
+Uso:
+    python tiles.py build    Generar data/build/teselas.mbtiles a partir de los datos procesados
+    python tiles.py serve    Servir las teselas en http://127.0.0.1:8765/{z}/{x}/{y}.pbf
+"""
+import argparse
+import errno
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import urllib.request
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import geopandas as gpd
+import shapely
+
+from pipeline import BUILD_DIR, build_point_clusters, simplify_preserving_topology
+
+MBTILES_PATH = os.path.join(BUILD_DIR, "teselas.mbtiles")
+
+# Rango de zoom precalculado; por encima del máximo Leaflet sobre-escala la última tesela
+ZOOM_MIN_TESELAS = 4
+ZOOM_MAX_TESELAS = 10
+
+EXTENSION_TESELA = 4096
+BUFFER_TESELA = 64
+ORIGEN_MERCATOR = 20037508.342789244
+
+HOST_TESELAS = "127.0.0.1"
+# 0: el sistema elige un puerto libre (la app); `python tiles.py serve` usa 8765 si no se configura
+PUERTO_TESELAS = int(os.environ.get("FNA_PUERTO_TESELAS", 0))
+PUERTO_SERVE = PUERTO_TESELAS or 8765
+
+# Respuesta de /salud con la que se reconoce un servidor de teselas ya corriendo
+FIRMA_SERVIDOR = b"fna-teselas"
+
+def tile_bounds(z, x, y):
+    """Límites (minx, miny, maxx, maxy) de una tesela en metros Web Mercator"""
+    tamano = 2 * ORIGEN_MERCATOR / 2 ** z
+    minx = -ORIGEN_MERCATOR + x * tamano
+    maxy = ORIGEN_MERCATOR - y * tamano
+    return (minx, maxy - tamano, minx + tamano, maxy)
+
+def _tile_ranges(bounds, z):
+    """Rangos de columnas y filas de teselas que cubren cada caja (minx, miny, maxx, maxy)"""
+    tamano = 2 * ORIGEN_MERCATOR / 2 ** z
+    maximo = 2 ** z - 1
+    x0 = np.clip(np.floor((bounds[:, 0] + ORIGEN_MERCATOR) / tamano), 0, maximo).astype(int)
+    x1 = np.clip(np.floor((bounds[:, 2] + ORIGEN_MERCATOR) / tamano), 0, maximo).astype(int)
+    y0 = np.clip(np.floor((ORIGEN_MERCATOR - bounds[:, 3]) / tamano), 0, maximo).astype(int)
+    y1 = np.clip(np.floor((ORIGEN_MERCATOR - bounds[:, 1]) / tamano), 0, maximo).astype(int)
+    return x0, x1, y0, y1
+
+def _layer_features(geoms, propiedades, caja):
+    """Recortar una capa a la caja de la tesela y armar sus features MVT"""
+    recortes = shapely.clip_by_rect(geoms, *caja)
+    features = []
+    for geometria, props in zip(recortes, propiedades):
+        if geometria is not None and not geometria.is_empty:
+            features.append({'geometry': geometria, 'properties': props})
+    return features
+
+def build_tiles(data_unida, df, path=MBTILES_PATH, zooms=range(ZOOM_MIN_TESELAS, ZOOM_MAX_TESELAS + 1)):
+    """Precalcular las teselas vectoriales de departamentos y oficinas en un archivo MBTiles"""
+    # Solo se necesita para compilar las teselas, no para servirlas
+    import mapbox_vector_tile
+
+    departamentos = data_unida[['DPTO_CNMBR', 'cantidad_oficinas', 'geometry']].to_crs(3857)
+    geoms_departamentos = np.asarray(departamentos.geometry.values, dtype=object)
+    props_departamentos = [
+        {'id': str(indice), 'DPTO_CNMBR': nombre, 'cantidad_oficinas': int(cantidad)}
+        for indice, nombre, cantidad in zip(departamentos.index, departamentos['DPTO_CNMBR'], departamentos['cantidad_oficinas'])
+    ]
+
+    ubicadas = df[~df['fuera_de_poligonos']] if 'fuera_de_poligonos' in df.columns else df.iloc[0:0]
+    clusters = build_point_clusters(ubicadas['latitud_corregida'], ubicadas['longitud_corregida'], niveles=tuple(zooms))
+    puntos = gpd.GeoSeries(gpd.points_from_xy(clusters['longitud'], clusters['latitud']), crs='EPSG:4326').to_crs(3857)
+    clusters['geometry'] = np.asarray(puntos.values, dtype=object)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conexion = sqlite3.connect(tmp)
+    conexion.executescript("""
+        CREATE TABLE metadata (name TEXT, value TEXT);
+        CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+        CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+    """)
+
+    total = 0
+    for z in zooms:
+        # Simplificación del tamaño de una unidad de tesela, conservando fronteras compartidas
+        tolerancia = 2 * ORIGEN_MERCATOR / (2 ** z * EXTENSION_TESELA)
+        geoms_z = simplify_preserving_topology(geoms_departamentos, tolerancia)
+        arbol = shapely.STRtree(geoms_z)
+        puntos_z = clusters[clusters['zoom'] == z]
+        geoms_puntos = puntos_z['geometry'].to_numpy()
+        arbol_puntos = shapely.STRtree(geoms_puntos)
+
+        x0, x1, y0, y1 = _tile_ranges(shapely.bounds(geoms_z), z)
+        teselas = {(x, y) for a, b, c, d in zip(x0, x1, y0, y1) for x in range(a, b + 1) for y in range(c, d + 1)}
+
+        margen = (2 * ORIGEN_MERCATOR / 2 ** z) * BUFFER_TESELA / EXTENSION_TESELA
+        for x, y in sorted(teselas):
+            limites = tile_bounds(z, x, y)
+            caja = (limites[0] - margen, limites[1] - margen, limites[2] + margen, limites[3] + margen)
+            idx = arbol.query(shapely.box(*caja), predicate='intersects')
+            if len(idx) == 0:
+                continue
+            idx_puntos = arbol_puntos.query(shapely.box(*limites), predicate='intersects')
+
+            capas = [{
+                'name': 'departamentos',
+                'features': _layer_features(geoms_z[idx], [props_departamentos[i] for i in idx], caja)
+            }]
+            if len(idx_puntos):
+                capas.append({
+                    'name': 'oficinas',
+                    'features': [
+                        {'geometry': geoms_puntos[i], 'properties': {'cantidad': int(puntos_z['cantidad'].iat[i])}}
+                        for i in idx_puntos
+                    ]
+                })
+
+            contenido = mapbox_vector_tile.encode(capas, default_options={
+                'quantize_bounds': limites,
+                'extents': EXTENSION_TESELA
+            })
+            conexion.execute(
+                "INSERT INTO tiles VALUES (?, ?, ?, ?)",
+                (z, x, 2 ** z - 1 - y, sqlite3.Binary(gzip.compress(contenido)))
+            )
+            total += 1
+
+    minx, miny, maxx, maxy = data_unida.to_crs(4326).total_bounds
+    metadata = {
+        'name': 'fna_oficinas',
+        'format': 'pbf',
+        'type': 'overlay',
+        'minzoom': str(min(zooms)),
+        'maxzoom': str(max(zooms)),
+        'bounds': f"{minx},{miny},{maxx},{maxy}",
+        'json': json.dumps({'vector_layers': [
+            {'id': 'departamentos', 'fields': {'id': 'String', 'DPTO_CNMBR': 'String', 'cantidad_oficinas': 'Number'}},
+            {'id': 'oficinas', 'fields': {'cantidad': 'Number'}},
+        ]}),
+    }
+    conexion.executemany("INSERT INTO metadata VALUES (?, ?)", metadata.items())
+    conexion.commit()
+    conexion.close()
+    os.replace(tmp, path)
+
+    return total
+
+def tile_version(path=MBTILES_PATH):
+    """Marca del archivo MBTiles (modificación e inodo); None si no existe
+
+    build_tiles reemplaza el archivo con os.replace: cada compilación cambia la marca.
+    """
+    try:
+        estado = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{estado.st_mtime_ns:x}{estado.st_ino:x}"
+
+class TileStore:
+    """Lectura de teselas desde un MBTiles, con caché LRU de teselas ya servidas
+
+    Si el archivo se vuelve a compilar mientras el servidor corre, las conexiones
+    se reabren y la caché se vacía en la siguiente petición.
+    """
+
+    def __init__(self, path=MBTILES_PATH, max_teselas=2048):
+        self.path = path
+        self._local = threading.local()
+        self._version = None
+        self._read_cached = lru_cache(maxsize=max_teselas)(self._read_tile)
+
+    def get_tile(self, z, x, y):
+        version = tile_version(self.path)
+        if version != self._version:
+            # La versión es parte de la clave: otro hilo nunca recibe una tesela del archivo anterior
+            self._read_cached.cache_clear()
+            self._version = version
+        return self._read_cached(z, x, y, version) if version else None
+
+    def _connection(self, version):
+        if getattr(self._local, 'version', None) != version:
+            if hasattr(self._local, 'conexion'):
+                self._local.conexion.close()
+            self._local.conexion = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.version = version
+        return self._local.conexion
+
+    def _read_tile(self, z, x, y, version):
+        fila = self._connection(version).execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (z, x, 2 ** z - 1 - y)
+        ).fetchone()
+        return fila[0] if fila else None
+
+def _handler_for(store):
+    class TileHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] == '/salud':
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(FIRMA_SERVIDOR)))
+                self.end_headers()
+                self.wfile.write(FIRMA_SERVIDOR)
+                return
+
+            partes = self.path.split('?')[0].strip('/').split('/')
+            try:
+                z, x, y = int(partes[0]), int(partes[1]), int(partes[2].split('.')[0])
+            except (IndexError, ValueError):
+                self.send_error(404)
+                return
+
+            contenido = store.get_tile(z, x, y)
+            self.send_response(200 if contenido else 204)
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Cache-Control', 'public, max-age=86400')
+            if contenido:
+                self.send_header('Content-Type', 'application/x-protobuf')
+                self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(contenido)))
+            self.end_headers()
+            if contenido:
+                self.wfile.write(contenido)
+
+        def log_message(self, format, *args):
+            pass
+
+    return TileHandler
+
+def tile_server_running(host, port, timeout=1):
+    """Si en host:port ya responde un servidor de teselas de este módulo"""
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/salud", timeout=timeout) as respuesta:
+            return respuesta.read() == FIRMA_SERVIDOR
+    except OSError:
+        return False
+
+def start_tile_server(path=MBTILES_PATH, host=HOST_TESELAS, port=PUERTO_TESELAS):
+    """Iniciar el servidor de teselas en un hilo de fondo y devolver la plantilla de URL
+
+    Con port=0 se usa un puerto libre. Si el puerto pedido ya lo ocupa otro
+    servidor de teselas (otro worker o `python tiles.py serve`) se reutiliza.
+    """
+    try:
+        servidor = ThreadingHTTPServer((host, port), _handler_for(TileStore(path)))
+    except OSError as e:
+        if e.errno != errno.EADDRINUSE or not tile_server_running(host, port):
+            raise
+    else:
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        port = servidor.server_address[1]
+    return f"http://{host}:{port}/{{z}}/{{x}}/{{y}}.pbf"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teselas vectoriales del dashboard FNA")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    build = subparsers.add_parser('build', help="Generar el archivo MBTiles")
+    build.add_argument('--salida', default=MBTILES_PATH)
+    build.add_argument('--zoom-min', type=int, default=ZOOM_MIN_TESELAS)
+    build.add_argument('--zoom-max', type=int, default=ZOOM_MAX_TESELAS)
+
+    serve = subparsers.add_parser('serve', help="Servir las teselas por HTTP")
+    serve.add_argument('--mbtiles', default=MBTILES_PATH)
+    serve.add_argument('--host', default=HOST_TESELAS)
+    serve.add_argument('--puerto', type=int, default=PUERTO_SERVE)
+
+    args = parser.parse_args(argv)
+
+    if args.comando == 'build':
+        from pipeline import load_or_build_artifact
+
+        inicio = time.perf_counter()
+        data_unida, df = load_or_build_artifact()
+        total = build_tiles(data_unida, df, args.salida, range(args.zoom_min, args.zoom_max + 1))
+        print(json.dumps({
+            'mbtiles': args.salida,
+            'teselas': total,
+            'segundos': round(time.perf_counter() - inicio, 3)
+        }))
+
+    elif args.comando == 'serve':
+        url = start_tile_server(args.mbtiles, args.host, args.puerto)
+        print(f"Sirviendo {args.mbtiles} en {url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Codificación compacta de las capas del mapa: TopoJSON cuantizado y GeoJSON de precisión fija.
+
+Las fronteras que comparten dos regiones se guardan una sola vez como arcos. Las
+coordenadas se redondean a una rejilla entera (cuantización) y cada arco se
+escribe como diferencias entre puntos consecutivos, que casi siempre son números
+de uno o dos dígitos. El navegador reconstruye el GeoJSON con topojson.feature.
+"""
+import numpy as np
+import shapely
+
+OBJETO_TOPOJSON = 'departamentos'
+
+# Decimales de las coordenadas de los puntos (~1 m)
+DECIMALES_PUNTOS = 5
+
+def quantize(coords, translate, step):
+    """Coordenadas enteras en la rejilla de paso `step` con origen en `translate`"""
+    return np.rint((np.asarray(coords, dtype=float) - translate) / step).astype(np.int64)
+
+def _quantized_rings(geometria, translate, step):
+    """Anillos cuantizados de cada polígono, abiertos y sin puntos consecutivos repetidos"""
+    poligonos = []
+    for poligono in shapely.get_parts(geometria):
+        anillos = []
+        for anillo in shapely.get_rings(poligono):
+            puntos = quantize(shapely.get_coordinates(anillo)[:-1], translate, step)
+            repetidos = np.all(puntos == np.roll(puntos, 1, axis=0), axis=1)
+            puntos = puntos[~repetidos] if len(puntos) > 1 else puntos
+            if len(puntos) >= 3:
+                anillos.append(puntos)
+            elif not anillos:
+                # El exterior colapsó en la rejilla: el polígono no se ve a esta escala
+                break
+        if anillos:
+            poligonos.append(anillos)
+    return poligonos
+
+def _junctions(anillos, ancho):
+    """Claves de los puntos de cada anillo y si son uniones de más de dos bordes (extremos de los arcos)"""
+    if not anillos:
+        return [], []
+    claves = [puntos[:, 0] * ancho + puntos[:, 1] for puntos in anillos]
+    filas = np.concatenate([
+        np.column_stack([c, np.minimum(np.roll(c, 1), np.roll(c, -1)), np.maximum(np.roll(c, 1), np.roll(c, -1))])
+        for c in claves
+    ])
+
+    # Un punto es unión si aparece con pares de vecinos distintos en algún anillo
+    vecindades = np.unique(filas, axis=0)
+    unicas, conteos = np.unique(vecindades[:, 0], return_counts=True)
+    es_union = np.isin(filas[:, 0], unicas[conteos > 1])
+    return claves, np.split(es_union, np.cumsum([len(c) for c in claves])[:-1])
+
+def encode_topojson(geometries, properties, ids, step, object_name=OBJETO_TOPOJSON):
+    """Topología con arcos compartidos, coordenadas cuantizadas a `step` grados y codificación delta"""
+    geoms = np.asarray(geometries, dtype=object)
+    validas = ~shapely.is_missing(geoms)
+    validas[validas] = ~shapely.is_empty(geoms[validas])
+    translate = shapely.total_bounds(geoms[validas])[:2] if validas.any() else np.zeros(2)
+
+    poligonos = [_quantized_rings(g, translate, step) if valida else [] for g, valida in zip(geoms, validas)]
+    anillos = [puntos for geometria in poligonos for poligono in geometria for puntos in poligono]
+    ancho = max((int(puntos[:, 1].max()) for puntos in anillos), default=0) + 1
+    claves_anillos, uniones_anillos = _junctions(anillos, ancho)
+    siguiente_anillo = iter(zip(anillos, claves_anillos, uniones_anillos))
+
+    arcos, indices_arcos = [], {}
+
+    def arc_index(claves, puntos):
+        # Un arco recorrido al revés por el vecino se referencia como ~indice
+        directo = claves.tobytes()
+        if directo in indices_arcos:
+            return indices_arcos[directo]
+        inverso = claves[::-1].tobytes()
+        if inverso in indices_arcos:
+            return ~indices_arcos[inverso]
+        indices_arcos[directo] = len(arcos)
+        arcos.append(np.diff(puntos, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).tolist())
+        return len(arcos) - 1
+
+    def ring_arcs():
+        # Los anillos se recorren en el mismo orden en que se aplanaron
+        puntos, claves, es_union = next(siguiente_anillo)
+        cortes = np.flatnonzero(es_union)
+        if len(cortes) == 0:
+            # Anillo sin uniones (isla o enclave): empezar en un punto canónico para reconocerlo
+            cortes = np.array([np.argmin(claves)])
+        claves = np.roll(claves, -cortes[0])
+        puntos = np.roll(puntos, -cortes[0], axis=0)
+        claves = np.append(claves, claves[:1])
+        puntos = np.vstack([puntos, puntos[:1]])
+        limites = [*(cortes - cortes[0]), len(claves) - 1]
+        return [arc_index(claves[a:b + 1], puntos[a:b + 1]) for a, b in zip(limites[:-1], limites[1:])]
+
+    geometrias = []
+    for geometria, propiedades, identificador in zip(poligonos, properties, ids):
+        objeto = {'type': None}
+        if len(geometria) == 1:
+            objeto = {'type': 'Polygon', 'arcs': [ring_arcs() for _ in geometria[0]]}
+        elif geometria:
+            objeto = {'type': 'MultiPolygon', 'arcs': [[ring_arcs() for _ in p] for p in geometria]}
+        geometrias.append({**objeto, 'id': identificador, 'properties': propiedades})
+
+    return {
+        'type': 'Topology',
+        'transform': {'scale': [step, step], 'translate': [float(translate[0]), float(translate[1])]},
+        'objects': {object_name: {'type': 'GeometryCollection', 'geometries': geometrias}},
+        'arcs': arcos,
+    }
+
+def geojson_points(longitudes, latitudes, properties, decimals=DECIMALES_PUNTOS):
+    """FeatureCollection de puntos con coordenadas de precisión fija y solo las propiedades dadas"""
+    lon = np.round(np.asarray(longitudes, dtype=float), decimals).tolist()
+    lat = np.round(np.asarray(latitudes, dtype=float), decimals).tolist()
+    columnas = {nombre: np.asarray(valores).tolist() for nombre, valores in properties.items()}
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'id': i,
+                'geometry': {'type': 'Point', 'coordinates': [lon[i], lat[i]]},
+                'properties': {nombre: valores[i] for nombre, valores in columnas.items()},
+            }
+            for i in range(len(lon))
+        ],
+    }
@@ -0,0 +1,509 @@
+"""Construcción de mapas Folium y gráficos Plotly del dashboard FNA.
+
+Se importa solo al elegir la sección de análisis visual, para que el texto
+del dashboard no espere a cargar las librerías geográficas y de gráficos.
+"""
+import numpy as np
+import pandas as pd
+import folium
+from folium.plugins import VectorGridProtobuf
+from branca.element import MacroElement
+from jinja2 import Template
+import plotly.express as px
+
+from metrics import detailed, payload_size, stage
+from pipeline import METRICAS, NIVELES_CLUSTER, NIVELES_ZOOM, web_mercator
+from tiles import ZOOM_MAX_TESELAS
+from topology import OBJETO_TOPOJSON, encode_topojson, geojson_points
+
+def clusters_for_view(clusters, zoom, center, width=1400, height=500):
+    """Grupos de oficinas del nivel de zoom dado dentro de la vista del mapa"""
+    nivel = min(max(int(zoom), NIVELES_CLUSTER[0]), NIVELES_CLUSTER[-1])
+    visibles = clusters[clusters['zoom'] == nivel]
+    
+    # Recortar a la vista (con margen) en coordenadas de píxel del zoom actual
+    escala = 256 * 2 ** zoom
+    cx, cy = web_mercator(center[0], center[1])
+    x, y = web_mercator(visibles['latitud'].to_numpy(), visibles['longitud'].to_numpy())
+    dentro = (np.abs((x - cx) * escala) <= width) & (np.abs((y - cy) * escala) <= height)
+    return visibles[dentro]
+
+def detail_zoom(zoom):
+    """Zoom representativo del nivel de detalle que corresponde al zoom solicitado"""
+    if zoom > NIVELES_ZOOM[-1] + 1:
+        return NIVELES_ZOOM[-1] + 2
+    return max([z for z in NIVELES_ZOOM if z <= zoom], default=NIVELES_ZOOM[0])
+
+def geometry_column_for_zoom(data, zoom):
+    """Elegir la columna de geometría adecuada para el zoom solicitado"""
+    nivel = detail_zoom(zoom)
+    columna = f'geometry_z{nivel}' if nivel in NIVELES_ZOOM else 'geometry'
+    return columna if columna in data.columns else 'geometry'
+
+# Paso de cuantización de la geometría completa (~0.1 m), usada en los zooms más altos
+PASO_MINIMO_GRADOS = 1e-6
+
+def quantization_step(zoom):
+    """Paso de cuantización en grados: un cuarto de píxel al zoom del nivel de detalle"""
+    nivel = detail_zoom(zoom)
+    if nivel not in NIVELES_ZOOM:
+        return PASO_MINIMO_GRADOS
+    return 360 / (256 * 2 ** nivel) / 4
+
+def filter_mask(data, office_range, selected_regions):
+    """Máscara booleana de los departamentos que pasan los filtros del sidebar"""
+    cantidades = data['cantidad_oficinas'].to_numpy()
+    mascara = (cantidades >= office_range[0]) & (cantidades <= office_range[1])
+    
+    if selected_regions:
+        mascara &= np.isin(data['DPTO_CNMBR_NORM'].to_numpy(), list(selected_regions))
+    
+    return mascara
+
+def filter_data(data, office_range, selected_regions):
+    """Aplicar los filtros del sidebar (solo se copian las filas seleccionadas)"""
+    return data[filter_mask(data, office_range, selected_regions)]
+
+# Paletas de la segunda capa según el tipo de mapa
+PALETAS_MAPA = {
+    'thematic': ['#7CFC00', '#FFFF00', '#FFA500', '#FF0000', '#800080'],
+    'blues': ["#9FBFFFFF", "#3E7DFBFF", "#0000FFE1", "#000080", '#FFFF00FF'],
+}
+
+def map_colors(cantidades, map_type):
+    """Color de relleno por cantidad de oficinas para los departamentos filtrados"""
+    colores = PALETAS_MAPA['thematic'] if map_type == 'thematic' else PALETAS_MAPA['blues']
+    valores_unicos = np.unique(np.asarray(cantidades))
+    return {int(valor): colores[i % len(colores)] for i, valor in enumerate(valores_unicos)}
+
+def metric_breaks(valores, clases=len(PALETAS_MAPA['thematic'])):
+    """Cortes por cuantiles de una métrica continua, sin contar los departamentos sin dato"""
+    valores = np.asarray(valores, dtype=float)
+    validos = valores[np.isfinite(valores)]
+    if len(validos) == 0:
+        return np.array([])
+    return np.unique(np.quantile(validos, np.linspace(0, 1, clases + 1)[1:-1]))
+
+def metric_colors(valores, map_type, metric='cantidad_oficinas', referencia=None):
+    """Color de relleno de cada valor; las métricas continuas se agrupan en cuantiles de `referencia`"""
+    valores = np.asarray(valores, dtype=float)
+    if metric == 'cantidad_oficinas':
+        color_dict = map_colors(valores, map_type)
+        return [color_dict.get(int(valor), '#CCCCCC') for valor in valores]
+    
+    colores = np.array(PALETAS_MAPA['thematic'] if map_type == 'thematic' else PALETAS_MAPA['blues'])
+    clases = np.digitize(valores, metric_breaks(valores if referencia is None else referencia))
+    return np.where(np.isfinite(valores), colores[np.minimum(clases, len(colores) - 1)], '#CCCCCC').tolist()
+
+def metric_legend(referencia, map_type):
+    """Color y rango de valores de cada clase de una métrica continua"""
+    colores = PALETAS_MAPA['thematic'] if map_type == 'thematic' else PALETAS_MAPA['blues']
+    cortes = metric_breaks(referencia)
+    if len(cortes) == 0:
+        return []
+    etiquetas = [f"< {cortes[0]:.3g}"]
+    etiquetas += [f"{a:.3g} – {b:.3g}" for a, b in zip(cortes[:-1], cortes[1:])]
+    etiquetas.append(f"≥ {cortes[-1]:.3g}")
+    return list(zip(colores, etiquetas))
+
+class RegisterBaseLayer(MacroElement):
+    """Exponer la capa base de departamentos al navegador para reestilizarla"""
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        window.capa_departamentos = {{ this._parent.get_name() }};
+        {% endmacro %}
+    """)
+
+class RegisterTileLayer(MacroElement):
+    """Exponer la capa de teselas al navegador y mostrar sus atributos al pasar el cursor"""
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var capa = {{ this._parent.get_name() }};
+            window.capa_departamentos = capa;
+            capa.on('mouseover', function(e) {
+                var p = e.layer.properties || {};
+                // Conteos de los filtros actuales (DepartmentRestyle); los de la tesela son los de todas las oficinas
+                var cantidades = window.cantidades_departamentos || {};
+                var texto = p.DPTO_CNMBR !== undefined
+                    ? 'Departamento: ' + p.DPTO_CNMBR + '<br>Oficinas: ' + (p.id in cantidades ? cantidades[p.id] : p.cantidad_oficinas)
+                    : 'Oficinas: ' + p.cantidad;
+                capa.bindTooltip(texto, {sticky: true}).openTooltip(e.latlng);
+            });
+            capa.on('mouseout', function() { capa.unbindTooltip(); });
+        })();
+        {% endmacro %}
+    """)
+
+class DepartmentRestyle(MacroElement):
+    """Aplicar en el navegador el color de cada departamento según el filtro y sus conteos al tooltip"""
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var estilos = {{ this.estilos|tojson }};
+            var cantidades = {{ this.cantidades|tojson }};
+            var capa = window.capa_departamentos;
+            if (!capa) { return; }
+            if (capa.setFeatureStyle) {
+                // Teselas vectoriales: estilo por id de feature y conteos para el tooltip
+                Object.keys(estilos).forEach(function(id) {
+                    capa.setFeatureStyle(id, {fill: true, fillColor: estilos[id], color: 'black', weight: 1.1, fillOpacity: 0.6});
+                });
+                window.cantidades_departamentos = cantidades;
+                // Con filtros de oficinas los grupos llegan en esta capa y se ocultan los de las teselas
+                var ocultar = {{ this.ocultar_oficinas|tojson }};
+                if (!!window.ocultar_oficinas_teselas !== ocultar) {
+                    window.ocultar_oficinas_teselas = ocultar;
+                    capa.redraw();
+                }
+            } else {
+                capa.eachLayer(function(layer) {
+                    layer.setStyle({fillColor: estilos[layer.feature.id] || '#F7F7F7FF'});
+                    // Los filtros de oficinas cambian los conteos que muestra el tooltip de la capa base
+                    if (cantidades && layer.feature.id in cantidades) {
+                        layer.feature.properties.cantidad_oficinas = cantidades[layer.feature.id];
+                    }
+                });
+            }
+        })();
+        {% endmacro %}
+    """)
+    
+    def __init__(self, estilos, cantidades=None, ocultar_oficinas=False):
+        super().__init__()
+        self._name = 'DepartmentRestyle'
+        self.estilos = estilos
+        self.cantidades = cantidades
+        self.ocultar_oficinas = ocultar_oficinas
+
+# Estilo común de los polígonos; el relleno depende de la capa
+ESTILO_REGIONES = {'fillColor': '#F7F7F7FF', 'color': 'black', 'weight': 1.1, 'fillOpacity': 0.6}
+
+class RegionLayer(folium.TopoJson):
+    """Capa TopoJSON de regiones con un estilo común y el relleno de cada región por su id
+
+    El estilo se calcula en el navegador a partir de la tabla de colores, en lugar
+    de repetir un diccionario de estilo en las propiedades de cada región.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }}_data = {{ this.data|tojson }};
+            var {{ this.get_name() }}_colores = {{ this.colores|tojson }};
+            var {{ this.get_name() }} = L.geoJson(
+                topojson.feature(
+                    {{ this.get_name() }}_data,
+                    {{ this.get_name() }}_data{{ this._safe_object_path }}
+                ),
+                {
+                    style: function(feature) {
+                        var estilo = Object.assign({}, {{ this.estilo|tojson }});
+                        var color = {{ this.get_name() }}_colores[feature.id];
+                        if (color) { estilo.fillColor = color; }
+                        return estilo;
+                    }
+                }
+            ).addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, data, colores=None, estilo=ESTILO_REGIONES, tooltip=None):
+        super().__init__(data, f'objects.{OBJETO_TOPOJSON}', tooltip=tooltip)
+        self._name = 'RegionLayer'
+        self.colores = {str(identificador): color for identificador, color in (colores or {}).items()}
+        self.estilo = estilo
+
+    def style_data(self):
+        """Sin estilos por región: se aplican en el navegador"""
+
+def region_topology(data, columna_geometria, paso):
+    """TopoJSON cuantizado de las regiones con solo las propiedades del tooltip"""
+    return encode_topojson(
+        data[columna_geometria].to_numpy(),
+        data[['DPTO_CNMBR', 'cantidad_oficinas']].to_dict('records'),
+        data.index.tolist(),
+        paso
+    )
+
+def region_tooltip():
+    """Tooltip con el nombre y la cantidad de oficinas de la región"""
+    return folium.GeoJsonTooltip(
+        fields=['DPTO_CNMBR', 'cantidad_oficinas'],
+        aliases=['Departamento: ', 'Oficinas: '],
+        localize=True
+    )
+
+def create_folium_map(all_data, filtered_data, map_type, zoom=5, center=(4.5709, -74.2973), points=None, client_side=False, tile_url=None,
+                      metric='cantidad_oficinas'):
+    """Crear mapa Folium con sistema de dos capas y, opcionalmente, las oficinas agrupadas
+
+    Con client_side=True solo se incluye la capa base; filtros y colores se aplican
+    en el navegador con la capa de create_style_layer. Con tile_url, la capa base y
+    las oficinas se leen de teselas vectoriales en lugar de GeoJSON embebido.
+    """
+    # Renderizar las capas vectoriales en canvas en lugar de un elemento SVG por figura
+    mapa = folium.Map(location=list(center), zoom_start=zoom, prefer_canvas=True)
+    
+    if tile_url:
+        add_vector_tile_layer(mapa, tile_url)
+        return mapa
+    
+    # Enviar solo la geometría simplificada correspondiente al zoom, cuantizada a un cuarto de píxel
+    columna_geometria = geometry_column_for_zoom(all_data, zoom)
+    paso = quantization_step(zoom)
+
+    # PRIMERA CAPA: Todos los departamentos en gris claro
+    with stage('mapa.capa_base') as registro:
+        capa_base = RegionLayer(
+            region_topology(all_data, columna_geometria, paso),
+            tooltip=region_tooltip()
+        ).add_to(mapa)
+        RegisterBaseLayer().add_to(capa_base)
+        if detailed():
+            registro['bytes'] = payload_size(capa_base.data)
+    
+    # SEGUNDA CAPA: Solo departamentos filtrados con colores según el tipo de mapa
+    if client_side:
+        # Los colores y los puntos llegan aparte como capa de estilos (create_style_layer)
+        return mapa
+    
+    if not filtered_data.empty and columna_geometria in filtered_data.columns and not filtered_data[columna_geometria].isnull().all():
+        colores = metric_colors(filtered_data[metric], map_type, metric, all_data[metric])
+
+        # Añadir la segunda capa con los datos filtrados
+        with stage('mapa.capa_filtrada') as registro:
+            capa_filtrada = RegionLayer(
+                region_topology(filtered_data, columna_geometria, paso),
+                colores=dict(zip(filtered_data.index, colores)),
+                estilo={**ESTILO_REGIONES, 'fillColor': '#CCCCCC'},
+                tooltip=region_tooltip()
+            ).add_to(mapa)
+            if detailed():
+                registro['bytes'] = payload_size(capa_filtrada.data)
+    
+    # TERCERA CAPA: Oficinas agrupadas en el servidor
+    with stage('mapa.puntos'):
+        add_point_layer(mapa, points)
+    
+    return mapa
+
+def add_vector_tile_layer(parent, tile_url):
+    """Añadir departamentos y oficinas desde el servidor de teselas vectoriales"""
+    opciones = """{
+        rendererFactory: L.canvas.tile,
+        interactive: true,
+        maxNativeZoom: %d,
+        getFeatureId: function(f) { return f.properties.id; },
+        vectorTileLayerStyles: {
+            departamentos: {fill: true, fillColor: '#F7F7F7FF', color: 'black', weight: 1.1, fillOpacity: 0.6},
+            oficinas: function(p) {
+                if (window.ocultar_oficinas_teselas) { return []; }
+                return {radius: Math.min(4 + 3 * Math.log2(p.cantidad), 24), fill: true,
+                        fillColor: '#2c3e50', color: 'white', weight: 1, fillOpacity: 0.8};
+            }
+        }
+    }""" % ZOOM_MAX_TESELAS
+    
+    capa = VectorGridProtobuf(tile_url, 'Departamentos', opciones).add_to(parent)
+    RegisterTileLayer().add_to(capa)
+
+def add_point_layer(parent, points):
+    """Añadir las oficinas agrupadas como una sola capa GeoJSON (se dibuja en canvas)"""
+    if points is None or points.empty:
+        return
+    
+    puntos = geojson_points(
+        points['longitud'],
+        points['latitud'],
+        {
+            'cantidad': points['cantidad'].to_numpy(),
+            'radio': np.minimum(4 + 3 * np.log2(points['cantidad'].to_numpy()), 24).round(1)
+        }
+    )
+    
+    def point_style_function(feature):
+        return {
+            'radius': feature['properties']['radio'],
+            'fillColor': '#2c3e50',
+            'color': 'white',
+            'weight': 1,
+            'fillOpacity': 0.8
+        }
+    
+    folium.GeoJson(
+        puntos,
+        name='Oficinas',
+        marker=folium.CircleMarker(),
+        style_function=point_style_function,
+        tooltip=folium.GeoJsonTooltip(
+            fields=['cantidad'],
+            aliases=['Oficinas: '],
+            localize=True
+        )
+    ).add_to(parent)
+
+def create_style_layer(all_data, mask, map_type, points=None, metric='cantidad_oficinas'):
+    """Capa con el diff de estilos por departamento y los puntos, para reestilizar en el navegador"""
+    capa = folium.FeatureGroup(name='Estilos')
+    
+    # Todos los departamentos: los que no pasan el filtro vuelven al gris de la capa base
+    valores = all_data[metric].to_numpy(dtype=float)
+    colores = iter(metric_colors(valores[mask], map_type, metric, valores))
+    estilos = {
+        str(indice): next(colores) if seleccionado else '#F7F7F7FF'
+        for indice, seleccionado in zip(all_data.index, mask)
+    }
+    
+    cantidades = dict(zip(map(str, all_data.index), all_data['cantidad_oficinas'].astype(int).tolist()))
+    # En modo teselas, recibir puntos significa que reemplazan los grupos precalculados en las teselas
+    DepartmentRestyle(estilos, cantidades, ocultar_oficinas=points is not None).add_to(capa)
+    with stage('mapa.puntos'):
+        add_point_layer(capa, points)
+    return capa
+
+def element_links(elemento):
+    """Hojas de estilo y scripts externos que declaran un elemento y sus hijos, como los reúne streamlit-folium"""
+    from branca.colormap import ColorMap
+    from folium.elements import JSCSSMixin
+    
+    css, js = [], []
+    pendientes = [elemento]
+    while pendientes:
+        actual = pendientes.pop(0)
+        if isinstance(actual, ColorMap):
+            js[:0] = ["https://d3js.org/d3.v4.min.js", "https://cdnjs.cloudflare.com/ajax/libs/d3/3.5.5/d3.min.js"]
+        if isinstance(actual, (ColorMap, JSCSSMixin)):
+            css += [href for _, href in getattr(actual, 'default_css', [])]
+            js += [src for _, src in getattr(actual, 'default_js', [])]
+        pendientes[:0] = list(getattr(actual, '_children', {}).values())
+    return list(dict.fromkeys(css)), list(dict.fromkeys(js))
+
+def render_map_component(mapa, key):
+    """Renderizar un mapa a las cadenas que recibe el componente de streamlit-folium
+
+    Las cadenas son inmutables: se guardan en caché y se comparten entre sesiones
+    sin copiar ni volver a renderizar el mapa en cada rerun. El mapa queda
+    modificado y no se debe volver a usar.
+    """
+    from streamlit_folium import _get_header, _get_html, _get_map_string, generate_js_hash, get_full_id
+    
+    mapa.get_root().render()
+    mapa.render()
+    # Mismo orden que st_folium: _get_map_string renombra los elementos del mapa
+    html = _get_html(mapa)
+    header = _get_header(mapa)
+    script = _get_map_string(mapa)
+    css_links, js_links = element_links(mapa)
+    return {
+        'script': script,
+        'header': header,
+        'html': html,
+        'id': get_full_id(mapa),
+        'clave': generate_js_hash(script, key, False),
+        'zoom': mapa.options.get('zoom'),
+        'css_links': css_links,
+        'js_links': js_links,
+    }
+
+def render_style_layer(capa):
+    """Script de la capa de estilos para el componente, renderizado contra un mapa vacío"""
+    from streamlit_folium import _get_feature_group_string
+    
+    css_links, js_links = element_links(capa)
+    return {
+        'script': _get_feature_group_string(capa, folium.Map(tiles=None), 0),
+        'css_links': css_links,
+        'js_links': js_links,
+    }
+
+def create_top_departments_chart(data, metric='cantidad_oficinas'):
+    """Crear gráfico de top 7 departamentos según la métrica"""
+    top_data = data.nlargest(7, metric)
+    
+    # Colores específicos para cada categoría
+    color_map = {
+        20: '#800080',  # Morado para 20 oficinas
+        4: '#FF0000',   # Rojo para 4 oficinas
+        3: '#FFA500',   # Naranja para 3 oficinas
+        2: '#FFFF00',   # Amarillo para 2 oficinas
+        1: '#7CFC00'    # Verde para 1 oficina
+    }
+    
+    # Asignar colores basados en la cantidad de oficinas o en la clase de la métrica
+    if metric == 'cantidad_oficinas':
+        colors = [color_map.get(x, '#CCCCCC') for x in top_data['cantidad_oficinas']]
+        etiqueta = 'Número de Oficinas'
+    else:
+        colors = metric_colors(top_data[metric], 'thematic', metric, data[metric])
+        etiqueta = METRICAS[metric]
+    
+    fig = px.bar(
+        top_data,
+        y='DPTO_CNMBR',
+        x=metric,
+        orientation='h',
+        title='',
+        labels={metric: etiqueta, 'DPTO_CNMBR': 'Departamento'}
+    )
+    
+    fig.update_traces(
+        marker_color=colors,
+        marker_line_color='rgb(8,48,107)',
+        marker_line_width=1.5
+    )
+    
+    fig.update_layout(
+        plot_bgcolor='white',
+        yaxis={'categoryorder': 'total ascending'},
+        height=400,
+        margin=dict(l=20, r=20, t=20, b=20),
+        showlegend=False
+    )
+    
+    return fig
+
+def create_distribution_chart(data, metric='cantidad_oficinas'):
+    """Crear gráfico de distribución por número de oficinas o por clase de la métrica"""
+    # Colores específicos para el gráfico de torta
+    colores_torta = ['#7CFC00', '#FFFF00', '#FFA500', '#FF0000', '#800080']
+    
+    if metric == 'cantidad_oficinas':
+        dist_data = data['cantidad_oficinas'].value_counts().sort_index()
+        nombres = [f"{int(x)} oficina(s)" for x in dist_data.index]
+    else:
+        # Departamentos por clase de cuantiles, las mismas del mapa
+        valores = data[metric].to_numpy(dtype=float)
+        validos = valores[np.isfinite(valores)]
+        leyenda = metric_legend(valores, 'thematic')
+        dist_data = pd.Series(np.digitize(validos, metric_breaks(valores))).value_counts().sort_index()
+        nombres = [leyenda[clase][1] for clase in dist_data.index]
+        colores_torta = [leyenda[clase][0] for clase in dist_data.index]
+    
+    fig = px.pie(
+        values=dist_data.values,
+        names=nombres,
+        title='',
+        color_discrete_sequence=colores_torta
+    )
+    
+    fig.update_traces(
+        textposition='inside',
+        textinfo='percent+label'
+    )
+    
+    fig.update_layout(
+        height=400,
+        showlegend=False,
+        margin=dict(l=20, r=20, t=20, b=20)
+    )
+    
+    return fig
+
+def style_dataframe(data):
+    """Color de fondo de cada fila según la cantidad de oficinas, calculado en una sola pasada"""
+    cantidades = data['cantidad_oficinas'].to_numpy()
+    fondos = np.select(
+        [cantidades >= 4, cantidades == 3, cantidades == 2],
+        ['background-color: #e8f5e8', 'background-color: #fff3cd', 'background-color: #ffeaa7'],
+        default='background-color: #f8f9fa'
+    )
+    return pd.DataFrame(np.repeat(fondos[:, None], data.shape[1], axis=1), index=data.index, columns=data.columns)